@@ -1,4 +1,4 @@
-import exceptions
+import network
 import model
 
 from discord.ext import commands
@@ -6,7 +6,6 @@ import datetime as dt
 import discord
 import base64
 import ujson
-import http
 
 class User:
     """Represents a Discord user."""
@@ -81,32 +80,18 @@ class Backend:
     @classmethod
     def setup(cls, bot: model.Bakerbot) -> None:
         cls.base = "https://discord.com/api/v9"
-        cls.session = bot.session
+        cls.http = network.Endpoint("discord", cls.base, error="message")
         cls.token = bot.secrets.get("discord-token", None)
 
     @classmethod
     async def get(cls, endpoint: str, **kwargs: dict) -> dict:
         """Send a HTTP GET request to the Discord REST API."""
-        async with Backend.session.get(f"{Backend.base}/{endpoint}", **kwargs) as response:
-            data = await response.json(encoding="utf-8", loads=ujson.loads)
-
-            if response.status != http.HTTPStatus.OK:
-                error = data.get("message", None)
-                raise exceptions.HTTPUnexpected(response.status, error)
-
-            return data
+        return await cls.http.get(endpoint, **kwargs)
 
     @classmethod
     async def post(cls, endpoint: str, **kwargs: dict) -> dict:
         """Send a HTTP POST request to the Discord REST API."""
-        async with Backend.session.post(f"{Backend.base}/{endpoint}", **kwargs) as response:
-            data = await response.json(encoding="utf-8", loads=ujson.loads)
-
-            if response.status != http.HTTPStatus.OK:
-                error = data.get("message", None)
-                raise exceptions.HTTPUnexpected(response.status, error)
-
-            return data
+        return await cls.http.post(endpoint, **kwargs)
 
 def setup(bot: model.Bakerbot) -> None:
     Backend.setup(bot)
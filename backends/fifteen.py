@@ -1,8 +1,7 @@
 import exceptions
+import network
 import model
 
-import asyncio
-import ujson
 import http
 
 class Backend:
@@ -10,24 +9,30 @@ class Backend:
     def setup(cls, bot: model.Bakerbot) -> None:
         cls.base = "https://api.15.ai"
         cls.cdn = "https://cdn.15.ai"
-        cls.session = bot.session
+        # Synthesis has no side effects, so POSTs are safe to retry while the API is overloaded.
+        cls.http = network.Endpoint("fifteen", cls.base, timeout=60, retries=4, retryable=cls.overloaded, idempotent=("GET", "HEAD", "POST"))
+
+    @staticmethod
+    def overloaded(response: network.Response) -> bool:
+        """Return whether the API responded with its "server error" (probably some form of rate-limiting)."""
+        if response.status != http.HTTPStatus.NOT_FOUND:
+            return False
+
+        try: data = response.json()
+        except ValueError: return False
+        return isinstance(data, dict) and data.get("message", None) == "server error"
 
     @classmethod
     async def post(cls, endpoint: str, **kwargs: dict) -> dict:
         """Send a HTTP POST request to the FifteenAI API."""
-        async with cls.session.post(f"{cls.base}/{endpoint}", **kwargs) as response:
-            data = await response.json(loads=ujson.loads, content_type=None)
-
-            if response.status == http.HTTPStatus.NOT_FOUND and "message" in data and data["message"] == "server error":
-                # Retry the response after waiting 1s (probably some form of rate-limiting).
-                await asyncio.sleep(1)
-                return await cls.post(endpoint, **kwargs)
-            elif response.status == http.HTTPStatus.UNPROCESSABLE_ENTITY:
-                raise Unprocessable
-            elif response.status != http.HTTPStatus.OK:
-                raise exceptions.HTTPUnexpected(response.status)
-
-            return data
+        response = await cls.http.request("POST", endpoint, **kwargs)
+
+        if response.status == http.HTTPStatus.UNPROCESSABLE_ENTITY:
+            raise Unprocessable
+        elif response.status != http.HTTPStatus.OK:
+            raise exceptions.HTTPUnexpected(response.status)
+
+        return response.json()
 
     @classmethod
     async def generate(cls, voice: str, text: str) -> str:
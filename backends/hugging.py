@@ -1,15 +1,13 @@
-import exceptions
+import network
 import model
 
 import typing
-import ujson
-import http
 
 class Backend:
     @classmethod
     def setup(cls, bot: model.Bakerbot) -> None:
         cls.base = "https://api-inference.huggingface.co"
-        cls.session = bot.session
+        cls.http = network.Endpoint("hugging", cls.base, timeout=60, error="error")
         cls.token = bot.secrets.get("hugging-token", None)
 
     @classmethod
@@ -19,16 +17,7 @@ class Backend:
     @classmethod
     async def post(cls, endpoint: str, **kwargs: dict) -> dict:
         """Send a HTTP POST request to the Hugging Face Inference API."""
-        async with cls.session.post(f"{cls.base}/{endpoint}", **kwargs) as response:
-            data = await response.read()
-
-            if response.status != http.HTTPStatus.OK:
-                try: formatted = ujson.loads(data)
-                except ValueError: formatted = {}
-                error = formatted.get("error", None)
-                raise exceptions.HTTPUnexpected(response.status, error)
-
-            return ujson.loads(data)
+        return await cls.http.post(endpoint, **kwargs)
 
     @classmethod
     async def generate(cls, model: typing.Any, query: str) -> str:
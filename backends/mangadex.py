@@ -1,11 +1,25 @@
 import exceptions
+import network
 import model
 
+import collections
+import asyncio
+import aiohttp
+import typing
+import bisect
+import heapq
 import ujson
 import http
+import math
+import time
+import sys
+import os
+import re
 
 class Relationship:
     """Represents Mangadex's `Relationship` API object."""
+    __slots__ = ("identifier", "type", "attributes")
+
     def __init__(self, data: dict) -> None:
         self.identifier: str = data["id"]
         self.type: str = data["type"]
@@ -13,6 +27,8 @@ class Relationship:
 
 class Tag:
     """Represents Mangadex's `Tag` API object."""
+    __slots__ = ("identifier", "name", "group", "version", "relationships")
+
     def __init__(self, data: dict) -> None:
         self.identifier: str = data["id"]
         self.name: str = data["attributes"]["name"]["en"]
@@ -29,83 +45,437 @@ class Tag:
             self.relationships.append(ship)
 
 class Chapter:
-    """Represents Mangadex's `Chapter` API object."""
+    """Represents Mangadex's `Chapter` API object (compactly, since series can have thousands of them)."""
+    __slots__ = ("identifier", "title", "volume", "chapter", "language", "external_url", "version", "created_at",
+                 "updated_at", "publish_at", "related", "base_url", "expires", "hash", "data", "data_saver")
+
     def __init__(self, data: dict) -> None:
+        attributes = data["attributes"]
         self.identifier: str = data["id"]
-        self.title: str = data["attributes"]["title"]
-        self.volume: str | None = data["attributes"]["volume"]
-        self.chapter: str | None = data["attributes"]["chapter"]
-        self.language: str = data["attributes"]["translatedLanguage"]
-        self.hash: str = data["attributes"]["hash"]
-        self.data: list[str] = data["attributes"]["data"]
-        self.data_saver: list[str] = data["attributes"]["dataSaver"]
+        self.title: str | None = attributes["title"]
+
+        # Strings that repeat across a feed are interned so every chapter shares one copy.
+        self.volume: str | None = attributes["volume"] and sys.intern(attributes["volume"])
+        self.chapter: str | None = attributes["chapter"]
+        self.language: str = sys.intern(attributes["translatedLanguage"])
 
         # WTFMD: `uploader` does not exist here???
         # self.uploader: str = data["attributes"]["uploader"]
 
-        self.external_url: str | None = data["attributes"]["externalUrl"]
-        self.version: int = data["attributes"]["version"]
-        self.created_at: int = data["attributes"]["createdAt"]
-        self.updated_at: int = data["attributes"]["updatedAt"]
-        self.publish_at: int = data["attributes"]["publishAt"]
+        self.external_url: str | None = attributes["externalUrl"]
+        self.version: int = attributes["version"]
+        self.created_at: str = attributes["createdAt"]
+        self.updated_at: str = attributes["updatedAt"]
+        self.publish_at: str = attributes["publishAt"]
 
-        self.relationships: list[Relationship] = []
-        for relationship in data["relationships"]:
-            ship = Relationship(relationship)
-            self.relationships.append(ship)
+        # Relationships are kept as `(id, type)` pairs and only turned into objects when asked for.
+        self.related: tuple[tuple[str, str], ...] = tuple((r["id"], sys.intern(r["type"])) for r in data["relationships"])
 
+        # Page information is only loaded once the chapter is opened (see `Chapter.base()`).
         self.base_url: str | None = None
+        self.expires: float = 0
+        self.hash: str | None = None
+        self.data: list[str] | None = None
+        self.data_saver: list[str] | None = None
+
+    @property
+    def relationships(self) -> list[Relationship]:
+        return [Relationship({"id": identifier, "type": kind}) for identifier, kind in self.related]
+
+    @property
+    def group(self) -> str | None:
+        return next((identifier for identifier, kind in self.related if kind == "scanlation_group"), None)
+
+    @property
+    def manga(self) -> str | None:
+        return next((identifier for identifier, kind in self.related if kind == "manga"), None)
+
+    def stale(self) -> bool:
+        """Return whether the base URL needs to be (re)fetched, as MangaDex@Home URLs expire."""
+        return self.base_url is None or time.monotonic() >= self.expires
+
+    def page(self, index: int, saver: bool=True) -> str:
+        """Return the image URL of a page (the chapter's base URL must be populated)."""
+        if saver:
+            return f"{self.base_url}/data-saver/{self.hash}/{self.data_saver[index]}"
+
+        return f"{self.base_url}/data/{self.hash}/{self.data[index]}"
+
+    def stream(self, index: int, saver: bool=False) -> typing.AsyncContextManager[aiohttp.ClientResponse]:
+        """Open the image of a page for streaming (the chapter's base URL must be populated)."""
+        return network.Transport.stream(self.page(index, saver))
 
     async def base(self) -> None:
-        """Populate the base URL attribute for this chapter."""
+        """Populate the base URL and page information for this chapter."""
         data = await Backend.get(f"at-home/server/{self.identifier}")
         self.base_url = data["baseUrl"]
+        self.expires = time.monotonic() + Backend.lifetime
+        self.hash = data["chapter"]["hash"]
+        self.data = data["chapter"]["data"]
+        self.data_saver = data["chapter"]["dataSaver"]
+
+class ChapterIndex:
+    """A sorted index of a manga's chapters, with duplicate releases of each chapter collapsed into one."""
+    __slots__ = ("keys", "chapters", "preferred", "unnumbered", "numbers", "numbered")
+
+    def __init__(self, preferred: str | None=None) -> None:
+        # Keys are `(volume, chapter, sequence)`, so series that restart their numbering each volume keep every chapter.
+        self.keys: list[tuple[float, float, int]] = []
+        self.chapters: list[Chapter] = []
+        self.preferred = preferred
+        self.unnumbered = 0
+
+        # Every chapter number (sorted) and the keys of the chapters with that number, for jumping to a chapter.
+        self.numbers: list[float] = []
+        self.numbered: dict[float, list[tuple[float, float, int]]] = {}
+
+    @classmethod
+    def build(cls, chapters: list[Chapter], preferred: str | None=None) -> "ChapterIndex":
+        """Return an index of `chapters`, preferring releases from the group that released the most of them by default."""
+        index = cls(preferred if preferred is not None else cls.favourite(chapters))
+        index.extend(chapters)
+        return index
+
+    @staticmethod
+    def favourite(chapters: list[Chapter]) -> str | None:
+        """Return the group that released the most of `chapters`, if any."""
+        groups = collections.Counter(c.group for c in chapters if c.group is not None)
+        return groups.most_common(1)[0][0] if groups else None
+
+    @staticmethod
+    def number(number: str | None) -> float | None:
+        """Return the numeric form of a chapter (or volume) number, if it has one."""
+        try:
+            return float(number) if number is not None else None
+        except ValueError:
+            return None
+
+    @classmethod
+    def volume(cls, chapter: Chapter) -> float:
+        """Return the numeric volume of a chapter (chapters without one sort after every volume)."""
+        volume = cls.number(chapter.volume)
+        return volume if volume is not None else math.inf
+
+    @staticmethod
+    def encode(key: tuple[float, float, int]) -> str:
+        """Return a string that identifies an index key (e.g. for a select option's value)."""
+        return f"{key[0]}:{key[1]}:{key[2]}"
+
+    @staticmethod
+    def decode(value: str) -> tuple[float, float, int]:
+        """Return the index key encoded by `ChapterIndex.encode()`."""
+        volume, number, sequence = value.split(":")
+        return float(volume), float(number), int(sequence)
+
+    def add(self, chapter: Chapter) -> tuple[float, float, int] | None:
+        """Add a release to the index, returning its key if it's a chapter that wasn't indexed before."""
+        volume = self.volume(chapter)
+        if (number := self.number(chapter.chapter)) is not None:
+            # Only releases of the same chapter in the same volume are duplicates.
+            key = (volume, number, 0)
+        else:
+            # Chapters without a number (oneshots, extras) can't be duplicates, so they go at the end of their volume in feed order.
+            key = (volume, math.inf, self.unnumbered)
+            self.unnumbered += 1
+
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            if self.preferred is not None and chapter.group == self.preferred != self.chapters[position].group:
+                self.chapters[position] = chapter
+
+            return None
+
+        # The feed is sorted by chapter, so this is almost always an append.
+        self.keys.insert(position, key)
+        self.chapters.insert(position, chapter)
+
+        if number is not None:
+            if number not in self.numbered:
+                bisect.insort(self.numbers, number)
+
+            bisect.insort(self.numbered.setdefault(number, []), key)
+
+        return key
+
+    def extend(self, chapters: list[Chapter]) -> list[tuple[tuple[float, float, int], Chapter]]:
+        """Add several releases to the index, returning the keys and releases of any new chapters."""
+        return [(key, chapter) for chapter in chapters if (key := self.add(chapter)) is not None]
+
+    def prefer(self, preferred: str | None, chapters: list[Chapter]) -> None:
+        """Switch to a different preferred group, swapping in its releases from `chapters` (keys stay the same)."""
+        if preferred == self.preferred:
+            return
+
+        self.preferred = preferred
+        for chapter in chapters:
+            if preferred is not None and chapter.group == preferred and (number := self.number(chapter.chapter)) is not None:
+                if (position := self.position((self.volume(chapter), number, 0))) is not None:
+                    self.chapters[position] = chapter
+
+    def position(self, key: tuple[float, float, int]) -> int | None:
+        """Return the position of the chapter with `key`, if it exists."""
+        position = bisect.bisect_left(self.keys, key)
+        return position if position < len(self.keys) and self.keys[position] == key else None
+
+    def find(self, number: str) -> int | None:
+        """Return the position of the chapter numbered `number` (the earliest volume's, if numbering restarts), if it exists."""
+        if (numeric := self.number(number)) is None or (keys := self.numbered.get(numeric, None)) is None:
+            return None
+
+        return self.position(keys[0])
+
+    def nearest(self, number: str, count: int=3) -> list[Chapter]:
+        """Return the numbered chapters closest to `number`."""
+        position = bisect.bisect_left(self.numbers, self.number(number) or 0)
+        begin = max(0, min(position - count // 2, len(self.numbers) - count))
+        return [self.chapters[self.position(self.numbered[n][0])] for n in self.numbers[begin:begin + count]]
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    def __getitem__(self, position: int) -> Chapter:
+        return self.chapters[position]
+
+class TitleIndex:
+    """A local trigram index over the titles (including alternative titles) of every manga the bot has seen."""
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.dirty = False
+
+        # Nothing is saved until the copy on disk has been loaded, otherwise it would be overwritten.
+        self.loaded = False
+
+        # The titles of each manga by ID (main title first), which is all that gets saved to disk.
+        self.names: dict[str, list[str]] = {}
+
+        # Normalised titles map to every manga that has them (as `manga ID: (original title, position in its titles)`),
+        # trigrams map to normalised titles.
+        self.entries: dict[str, dict[str, tuple[str, int]]] = {}
+        self.grams: dict[str, set[str]] = collections.defaultdict(set)
+
+    @staticmethod
+    def normalise(title: str) -> str:
+        """Return `title` without case, punctuation or repeated whitespace."""
+        return " ".join(re.findall(r"\w+", title.casefold()))
+
+    @staticmethod
+    def trigrams(normalised: str) -> set[str]:
+        """Return the trigrams of a normalised title (padded so that prefixes count for more)."""
+        padded = f"  {normalised} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @classmethod
+    def load(cls, path: str) -> "TitleIndex":
+        """Load an index from disk, starting from an empty one if it doesn't exist (or can't be read)."""
+        index = cls(path)
+
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                names = ujson.load(file)
+        except (OSError, ValueError):
+            return index
+
+        for identifier, titles in names.items():
+            index.insert(identifier, titles)
+
+        index.dirty = False
+        index.loaded = True
+        return index
+
+    async def restore(self) -> None:
+        """Load the copy on disk on a thread, keeping anything that was indexed while it loaded."""
+        loaded = await asyncio.to_thread(self.load, self.path)
+        recent = self.names
+        self.names, self.entries, self.grams = loaded.names, loaded.entries, loaded.grams
+        self.loaded = True
+
+        for identifier, titles in recent.items():
+            self.insert(identifier, titles)
+
+    def save(self, names: dict[str, list[str]]) -> None:
+        """Write a snapshot of the index's titles to disk, replacing the old file in one step."""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            ujson.dump(names, file, ensure_ascii=False)
+
+        os.replace(temporary, self.path)
+
+    async def flush(self) -> None:
+        """Save the index if anything has been added since it was last saved."""
+        if self.dirty and self.loaded:
+            self.dirty = False
+            await asyncio.to_thread(self.save, dict(self.names))
+
+    async def run(self, interval: float=300) -> None:
+        """Load the index, then periodically save it."""
+        await self.restore()
+
+        while True:
+            await asyncio.sleep(interval)
+
+            try:
+                await self.flush()
+            except OSError:
+                self.dirty = True
+
+    def discard(self, identifier: str) -> None:
+        """Remove the titles of a manga from the index."""
+        for title in self.names.pop(identifier, []):
+            normalised = self.normalise(title)
+            if (owners := self.entries.get(normalised, None)) is None or owners.pop(identifier, None) is None:
+                continue
+
+            # Other manga can share a title, it only leaves the index once none of them have it.
+            if not owners:
+                del self.entries[normalised]
+                for gram in self.trigrams(normalised):
+                    self.grams[gram].discard(normalised)
+
+        self.dirty = True
+
+    def insert(self, identifier: str, titles: list[str]) -> None:
+        """Index the titles of a manga, replacing any that it had before."""
+        if self.names.get(identifier, None) == titles:
+            return
+
+        self.discard(identifier)
+        self.names[identifier] = titles
+        self.dirty = True
+
+        for position, title in enumerate(titles):
+            if not (normalised := self.normalise(title)):
+                continue
+
+            if (owners := self.entries.get(normalised, None)) is None:
+                owners = self.entries[normalised] = {}
+                for gram in self.trigrams(normalised):
+                    self.grams[gram].add(normalised)
+
+            owners.setdefault(identifier, (title, position))
+
+    def add(self, manga: "Manga") -> None:
+        """Index the titles of a manga."""
+        titles = [t for t in (manga.attributes["title"].get("en", None), *manga.alt_titles) if t]
+        self.insert(manga.identifier, list(dict.fromkeys(titles)))
+
+    def find(self, title: str) -> str | None:
+        """Return the ID of the manga with exactly this title (ignoring case and punctuation), if it's been seen."""
+        if (owners := self.entries.get(self.normalise(title), None)) is None:
+            return None
+
+        # Main titles take precedence over other manga's alternative titles, otherwise the first one seen wins.
+        return min(owners.items(), key=lambda item: item[1][1])[0]
+
+    def suggest(self, query: str, count: int=5) -> list[tuple[str, str]]:
+        """Return the `(manga ID, title)` pairs that most closely match `query`, best first (at most one per manga)."""
+        normalised = self.normalise(query)
+        grams = self.trigrams(normalised)
+        postings = sorted((self.grams.get(gram, ()) for gram in grams), key=len)
+        shared = collections.Counter()
+        budget = 1024
+
+        # Rare trigrams narrow the index down to a shortlist without walking the huge postings of common ones.
+        for posting in postings:
+            if budget <= 0:
+                break
+
+            shared.update(posting)
+            budget -= len(posting)
+
+        # The shortlist is ranked by the Dice coefficient of its trigrams, with a bonus for starting with the query.
+        scores = {}
+        for title, _ in shared.most_common(32):
+            candidate = self.trigrams(title)
+            score = 2 * len(grams & candidate) / (len(grams) + len(candidate)) + (0.5 if title.startswith(normalised) else 0)
+            for identifier, (original, _) in self.entries[title].items():
+                if score > scores.get(identifier, (0, None))[0]:
+                    scores[identifier] = (score, original)
+
+        best = heapq.nlargest(count, scores.items(), key=lambda item: item[1][0])
+        return [(identifier, original) for identifier, (_, original) in best]
 
 class Manga:
-    """Represents Mangadex's `Manga` API object."""
+    """Represents Mangadex's `Manga` API object (attributes are read from the raw JSON when accessed)."""
+    __slots__ = ("identifier", "attributes", "related", "volumes", "chapters")
+
     def __init__(self, data: dict) -> None:
         self.identifier: str = data["id"]
-        self.title: str = data["attributes"]["title"]["en"]
-
-        self.alt_titles: list[str] = []
-        for titles in data["attributes"]["altTitles"]:
-            titles = list(titles.values())
-            self.alt_titles.extend(titles)
-
-        self.description: str = data["attributes"]["description"]["en"]
+        self.attributes: dict = data["attributes"]
+        self.related: list[dict] = data["relationships"]
 
         # WTFMD: `isLocked` was removed from the API, but it's still in the docs.
         # self.is_locked: bool = data["attributes"]["isLocked"]
 
-        self.links: dict[str, str] = data["attributes"]["links"]
-        self.original_language: str = data["attributes"]["originalLanguage"]
-        self.last_volume: str | None = data["attributes"]["lastVolume"]
-        self.last_chapter: str | None = data["attributes"]["lastChapter"]
-        self.demographic: str | None = data["attributes"]["publicationDemographic"]
-        self.status: str | None = data["attributes"]["status"]
-        self.year: int | None = data["attributes"]["year"]
-        self.content_rating: str = data["attributes"]["contentRating"]
+        self.volumes: dict | None = None
+        self.chapters: list[Chapter] | None = None
 
-        self.tags: list[Tag] = []
-        for tag in data["attributes"]["tags"]:
-            taggified = Tag(tag)
-            self.tags.append(taggified)
+    @property
+    def title(self) -> str:
+        return self.attributes["title"]["en"]
 
-        self.version: int = data["attributes"]["version"]
-        self.created_at: str = data["attributes"]["createdAt"]
-        self.updated_at: str = data["attributes"]["updatedAt"]
+    @property
+    def alt_titles(self) -> list[str]:
+        return [title for titles in self.attributes["altTitles"] for title in titles.values()]
 
-        self.relationships: list[Relationship] = []
-        for relationship in data["relationships"]:
-            ship = Relationship(relationship)
-            self.relationships.append(ship)
+    @property
+    def description(self) -> str:
+        return self.attributes["description"]["en"]
 
-        self.volumes: dict | None = None
-        self.chapters: list[Chapter] | None = None
+    @property
+    def links(self) -> dict[str, str]:
+        return self.attributes["links"]
+
+    @property
+    def original_language(self) -> str:
+        return self.attributes["originalLanguage"]
+
+    @property
+    def last_volume(self) -> str | None:
+        return self.attributes["lastVolume"]
+
+    @property
+    def last_chapter(self) -> str | None:
+        return self.attributes["lastChapter"]
+
+    @property
+    def demographic(self) -> str | None:
+        return self.attributes["publicationDemographic"]
+
+    @property
+    def status(self) -> str | None:
+        return self.attributes["status"]
+
+    @property
+    def year(self) -> int | None:
+        return self.attributes["year"]
+
+    @property
+    def content_rating(self) -> str:
+        return self.attributes["contentRating"]
+
+    @property
+    def tags(self) -> list[Tag]:
+        return [Tag(tag) for tag in self.attributes["tags"]]
+
+    @property
+    def version(self) -> int:
+        return self.attributes["version"]
+
+    @property
+    def created_at(self) -> str:
+        return self.attributes["createdAt"]
+
+    @property
+    def updated_at(self) -> str:
+        return self.attributes["updatedAt"]
+
+    @property
+    def relationships(self) -> list[Relationship]:
+        return [Relationship(r) for r in self.related]
 
     def search_relationships(self, identifier: str) -> list[Relationship]:
         """Search the list of relationships for `identifier`."""
-        return [r for r in self.relationships if r.type == identifier]
+        return [Relationship(r) for r in self.related if r["type"] == identifier]
 
     def volume_count(self) -> int:
         """Return the number of volumes in this manga."""
@@ -128,9 +498,12 @@ class Manga:
     async def cover(self) -> str | None:
         """Return the cover for this manga."""
         if (covers := self.search_relationships("cover_art")):
-            # Just pick the first cover for now.
-            data = await Backend.get(f"cover/{covers[0].identifier}")
-            filename = data["data"]["attributes"]["fileName"]
+            # Just pick the first cover for now, and only ask the API if it wasn't expanded already.
+            if (attributes := covers[0].attributes) is None:
+                data = await Backend.get(f"cover/{covers[0].identifier}")
+                attributes = data["data"]["attributes"]
+
+            filename = attributes["fileName"]
             return f"{Backend.data}/covers/{self.identifier}/{filename}"
 
         return None
@@ -138,9 +511,12 @@ class Manga:
     async def author(self) -> str | None:
         """Return the author for this manga."""
         if (authors := self.search_relationships("author")):
-            # Just pick the first author for now.
-            data = await Backend.get(f"author/{authors[0].identifier}")
-            return data["data"]["attributes"]["name"]
+            # Just pick the first author for now, and only ask the API if it wasn't expanded already.
+            if (attributes := authors[0].attributes) is None:
+                data = await Backend.get(f"author/{authors[0].identifier}")
+                attributes = data["data"]["attributes"]
+
+            return attributes["name"]
 
         return None
 
@@ -150,20 +526,40 @@ class Manga:
         data = await Backend.get(f"manga/{self.identifier}/aggregate", params=parameters)
         self.volumes = data["volumes"]
 
-    async def feed(self, language: str) -> None:
+    async def stream(self, language: str, concurrency: int=4) -> typing.AsyncIterator[tuple[list[Chapter], int]]:
+        """Populate this manga's chapter information, yielding each page of chapters (in order) and the total as they arrive."""
+        endpoint = f"manga/{self.identifier}/feed"
+        parameters = {"limit": 500, "translatedLanguage[]": language, "order[chapter]": "asc"}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def page(offset: int) -> list[dict]:
+            async with semaphore:
+                data = await Backend.get(endpoint, params={**parameters, "offset": offset})
+                return data["data"]
+
+        # The first page says how many chapters there are, so the rest can be requested concurrently.
+        # The transport's rate limiter still paces the requests.
+        first = await Backend.get(endpoint, params={**parameters, "offset": 0})
+        total = first["total"]
+        self.chapters = [Chapter(c) for c in first["data"]]
+        yield self.chapters.copy(), total
+
+        offsets = range(parameters["limit"], total, parameters["limit"])
+        tasks = [asyncio.create_task(page(offset)) for offset in offsets]
+
+        try:
+            for task in tasks:
+                chapters = [Chapter(c) for c in await task]
+                self.chapters.extend(chapters)
+                yield chapters, total
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def feed(self, language: str, concurrency: int=4) -> None:
         """Populate this manga's chapter information."""
-        count = self.chapter_count()
-        self.chapters = []
-        offset = 0
-
-        while count > 0:
-            limit = min(count, 500)
-            parameters = {"limit": limit, "offset": offset, "translatedLanguage[]": language, "order[chapter]": "asc"}
-            data = await Backend.get(f"manga/{self.identifier}/feed", params=parameters)
-            chapters = [Chapter(m) for m in data["data"]]
-            self.chapters.extend(chapters)
-            count -= limit
-            offset += limit
+        async for _ in self.stream(language, concurrency):
+            pass
 
 class Backend:
     @classmethod
@@ -171,26 +567,57 @@ class Backend:
         cls.base = "https://api.mangadex.org"
         cls.data = "https://uploads.mangadex.org"
         cls.client = "https://mangadex.org"
-        cls.session = bot.session
+
+        # At-home base URLs are valid for about 15 minutes, so refresh them a little earlier than that.
+        cls.lifetime = 600
+
+        # Ask for authors and cover art to be embedded in manga responses, saving a request for each.
+        cls.includes = [("includes[]", "author"), ("includes[]", "cover_art")]
+
+        # Chapter lists change whenever something is uploaded, everything else rarely changes.
+        ttls = {"manga/*/feed": 300, "manga/*/aggregate": 300, "manga": 3600, "manga/*": 3600, "author/*": 86400, "cover/*": 86400}
+
+        # Mangadex allows roughly 5 requests per second from a single IP.
+        cls.http = network.Endpoint("mangadex", cls.base, timeout=15, error="errors", rate=(5, 1), burst=2, ttls=ttls)
+
+        # Titles of every manga seen so far, so exact titles skip the search and typos get suggestions.
+        # It starts empty and loads from disk in the background, so setup doesn't block the event loop.
+        cls.titles = TitleIndex(bot.secrets.get("mangadex-title-index", "mangadex-titles.json"))
+        cls.task = bot.loop.create_task(cls.titles.run())
 
     @classmethod
-    async def get(cls, endpoint: str, **kwargs: dict) -> dict:
-        """Send a HTTP GET request to the base Mangadex API."""
-        async with cls.session.get(f"{cls.base}/{endpoint}", **kwargs) as response:
-            data = await response.read()
+    def teardown(cls, bot: model.Bakerbot) -> None:
+        cls.task.cancel()
 
-            if response.status != http.HTTPStatus.OK:
-                try: formatted = ujson.loads(data)
-                except ValueError: formatted = {}
-                error = str(formatted.get("errors", None))
-                raise exceptions.HTTPUnexpected(response.status, error)
+        if cls.titles.dirty and cls.titles.loaded:
+            try:
+                cls.titles.save(cls.titles.names)
+            except OSError:
+                pass
 
-            return ujson.loads(data)
+    @classmethod
+    async def get(cls, endpoint: str, **kwargs: dict) -> dict:
+        """Send a HTTP GET request to the base Mangadex API."""
+        return await cls.http.get(endpoint, **kwargs)
 
     @classmethod
     async def manga(cls, title: str) -> Manga:
-        """Return a `Manga` object by searching the API."""
-        parameters = {"limit": 1, "title": title}
+        """Return a `Manga` object, checking the local title index before searching the API."""
+        if (identifier := cls.titles.find(title)) is not None:
+            try:
+                data = await cls.get(f"manga/{identifier}", params=cls.includes)
+            except exceptions.HTTPUnexpected as error:
+                # The manga might have been removed, in which case searching is the best we can do.
+                if error.status != http.HTTPStatus.NOT_FOUND:
+                    raise
+
+                cls.titles.discard(identifier)
+            else:
+                manga = Manga(data["data"])
+                cls.titles.add(manga)
+                return manga
+
+        parameters = [("limit", 1), ("title", title), *cls.includes]
         data = await cls.get("manga", params=parameters)
 
         if data["result"] != "ok":
@@ -199,8 +626,13 @@ class Backend:
             readable = ", ".join(errors) or None
             raise exceptions.HTTPUnexpected(http.HTTPStatus.OK, readable)
 
-        data = data["data"][0]
-        return Manga(data)
+        if not data["data"]:
+            suggestions = [t for _, t in cls.titles.suggest(title)]
+            raise NoResults(title, suggestions)
+
+        manga = Manga(data["data"][0])
+        cls.titles.add(manga)
+        return manga
 
     @classmethod
     async def search(cls, title: str, maximum: int) -> list[Manga]:
@@ -208,13 +640,45 @@ class Backend:
         if not 1 <= maximum <= 100:
             raise ValueError("Maximum must be between 1 and 100.")
 
-        parameters = {"limit": maximum, "title": title}
+        parameters = [("limit", maximum), ("title", title), *cls.includes]
         data = await cls.get("manga", params=parameters)
-        return [Manga(m) for m in data["data"]]
+        mangas = [Manga(m) for m in data["data"]]
+
+        for manga in mangas:
+            cls.titles.add(manga)
+
+        return mangas
+
+    @classmethod
+    async def updates(cls, identifiers: list[str], since: str, language: str="en") -> typing.AsyncIterator[list[Chapter]]:
+        """Yield pages of chapters from any manga in `identifiers` (up to 100) that were updated after `since`, oldest first."""
+        if not 1 <= len(identifiers) <= 100:
+            raise ValueError("Between 1 and 100 manga must be given.")
+
+        parameters = [("limit", 100), ("updatedAtSince", since), ("translatedLanguage[]", language),
+                      ("order[updatedAt]", "asc"), *(("manga[]", identifier) for identifier in identifiers)]
+
+        # Mangadex refuses to page past 10,000 results, anything beyond that has to wait for a later `since`.
+        for offset in range(0, 10000, 100):
+            data = await cls.get("chapter", params=[("offset", offset), *parameters])
+            yield [Chapter(c) for c in data["data"]]
+
+            if offset + 100 >= data["total"]:
+                break
 
 class NoAggregate(Exception):
     """Raised when a manga's aggregate is not available."""
     pass
 
+class NoResults(Exception):
+    """Raised when a search doesn't find any manga."""
+    def __init__(self, query: str, suggestions: list[str]) -> None:
+        self.query = query
+        self.suggestions = suggestions
+        super().__init__(f"No manga called {query} could be found.")
+
 def setup(bot: model.Bakerbot) -> None:
     Backend.setup(bot)
+
+def teardown(bot: model.Bakerbot) -> None:
+    Backend.teardown(bot)
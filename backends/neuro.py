@@ -1,15 +1,15 @@
 import exceptions
+import network
 import model
 
 import typing
-import ujson
 import http
 
 class Backend:
     @classmethod
     def setup(cls, bot: model.Bakerbot) -> None:
         cls.base = "https://api.neuro-ai.co.uk"
-        cls.session = bot.session
+        cls.http = network.Endpoint("neuro", cls.base, timeout=60, error="error")
         cls.token = bot.secrets.get("neuro-token", None)
 
     @classmethod
@@ -19,14 +19,7 @@ class Backend:
     @classmethod
     async def post(cls, endpoint: str, **kwargs) -> dict:
         """Send a HTTP POST request to the Neuro API."""
-        async with cls.session.post(f"{cls.base}/{endpoint}", **kwargs) as response:
-            data = await response.json(encoding="utf-8", loads=ujson.loads)
-
-            if response.status != http.HTTPStatus.OK:
-                error = data.get("error", None)
-                raise exceptions.HTTPUnexpected(response.status, error)
-
-            return data
+        return await cls.http.post(endpoint, **kwargs)
 
     @classmethod
     async def generate(cls, model: typing.Any, query: str) -> str:
@@ -1,15 +1,13 @@
-import exceptions
+import network
 import model
 
 import typing
-import ujson
-import http
 
 class Backend:
     @classmethod
     def setup(cls, bot: model.Bakerbot) -> None:
         cls.base = "https://api.openai.com/v1"
-        cls.session = bot.session
+        cls.http = network.Endpoint("openai", cls.base, timeout=60)
         cls.token = bot.secrets.get("openai-token", None)
 
     @classmethod
@@ -19,13 +17,7 @@ class Backend:
     @classmethod
     async def post(cls, endpoint: str, **kwargs) -> dict:
         """Send a HTTP POST request to OpenAI."""
-        async with cls.session.post(f"{cls.base}/{endpoint}", **kwargs) as response:
-            data = await response.json(encoding="utf-8", loads=ujson.loads)
-
-            if response.status != http.HTTPStatus.OK:
-                raise exceptions.HTTPUnexpected(response.status)
-
-            return data
+        return await cls.http.post(endpoint, **kwargs)
 
     @classmethod
     async def generate(cls, model: typing.Any, query: str) -> str:
@@ -1,9 +1,8 @@
 from functools import reduce
-import exceptions
+import network
 import model
 
 import typing
-import ujson
 import http
 
 class Response(typing.TypedDict, total=False):
@@ -23,20 +22,18 @@ class Backend:
     @classmethod
     def setup(cls, bot: model.Bakerbot) -> None:
         cls.base = "https://v2.jokeapi.dev"
-        cls.session = bot.session
+        # The API allows 120 requests per minute, so a full burst plus a minute of refills stays under that.
+        cls.http = network.Endpoint("sv443", cls.base, timeout=10, rate=(110, 60), burst=10)
 
     @classmethod
     async def get(cls, endpoint: str, **kwargs: dict) -> dict:
         """Send a HTTP GET request to sv443's joke API."""
-        async with cls.session.get(f"{cls.base}/{endpoint}", **kwargs) as response:
-            data = await response.read()
+        response = await cls.http.request("GET", endpoint, **kwargs)
 
-            if response.status == http.HTTPStatus.TOO_MANY_REQUESTS:
-                raise TooManyRequests
-            elif response.status != http.HTTPStatus.OK:
-                raise exceptions.HTTPUnexpected(response.status)
+        if response.status == http.HTTPStatus.TOO_MANY_REQUESTS:
+            raise TooManyRequests
 
-            return ujson.loads(data)
+        return cls.http.check(response)
 
     @classmethod
     async def joke(cls) -> Response:
@@ -1,11 +1,9 @@
-import exceptions
+import network
 import model
 
 import urllib.parse
 import multidict
 import hashlib
-import ujson
-import http
 import yarl
 
 class Source:
@@ -115,8 +113,8 @@ class Query:
 class Backend:
     @classmethod
     def setup(cls, bot: model.Bakerbot) -> None:
-        cls.base = "https://api.wolframalpha.com/"
-        cls.session = bot.session
+        cls.base = "https://api.wolframalpha.com"
+        cls.http = network.Endpoint("wolfram", cls.base, timeout=30, error="errors", ttls={"v2/query.jsp": 3600})
         cls.id = bot.secrets.get("wolfram-id", None)
         cls.salt = bot.secrets.get("wolfram-salt", None)
         cls.hashing = bot.secrets.get("wolfram-hash", False)
@@ -130,16 +128,7 @@ class Backend:
         absolute = f"{cls.base}/{endpoint}?{query}"
         url = yarl.URL(absolute, encoded=True)
 
-        async with cls.session.get(url, **kwargs) as response:
-            data = await response.read()
-
-            if response.status != http.HTTPStatus.OK:
-                try: formatted = ujson.loads(data)
-                except ValueError: formatted = {}
-                error = str(formatted.get("errors", None))
-                raise exceptions.HTTPUnexpected(response.status, error)
-
-            return ujson.loads(data)
+        return await cls.http.get(url, **kwargs)
 
     @classmethod
     async def request(cls, query: Query) -> Result:
@@ -0,0 +1,99 @@
+from backends import mangadex
+
+import tracemalloc
+import argparse
+import typing
+import ujson
+import uuid
+import gc
+
+class EagerRelationship:
+    """A replica of the `Relationship` object before it gained `__slots__`."""
+    def __init__(self, data: dict) -> None:
+        self.identifier: str = data["id"]
+        self.type: str = data["type"]
+        self.attributes: dict | None = data.get("attributes", None)
+
+class EagerChapter:
+    """A replica of the `Chapter` object before it was made compact."""
+    def __init__(self, data: dict) -> None:
+        self.identifier: str = data["id"]
+        self.title: str = data["attributes"]["title"]
+        self.volume: str | None = data["attributes"]["volume"]
+        self.chapter: str | None = data["attributes"]["chapter"]
+        self.language: str = data["attributes"]["translatedLanguage"]
+        self.hash: str = data["attributes"]["hash"]
+        self.data: list[str] = data["attributes"]["data"]
+        self.data_saver: list[str] = data["attributes"]["dataSaver"]
+        self.external_url: str | None = data["attributes"]["externalUrl"]
+        self.version: int = data["attributes"]["version"]
+        self.created_at: int = data["attributes"]["createdAt"]
+        self.updated_at: int = data["attributes"]["updatedAt"]
+        self.publish_at: int = data["attributes"]["publishAt"]
+
+        self.relationships: list[EagerRelationship] = []
+        for relationship in data["relationships"]:
+            ship = EagerRelationship(relationship)
+            self.relationships.append(ship)
+
+        self.base_url: str | None = None
+
+def chapter(index: int, pages: int) -> dict:
+    """Return a synthetic feed entry (including the page lists that the feed used to carry)."""
+    timestamp = "2021-05-01T12:00:00+00:00"
+    filenames = [f"{n + 1}-{uuid.uuid4().hex}{uuid.uuid4().hex}.png" for n in range(pages)]
+
+    return {
+        "id": str(uuid.uuid4()),
+        "type": "chapter",
+        "attributes": {
+            "volume": str(index // 10 + 1),
+            "chapter": str(index + 1),
+            "title": f"Chapter {index + 1}",
+            "translatedLanguage": "en",
+            "hash": uuid.uuid4().hex,
+            "data": filenames,
+            "dataSaver": [f"{name[:-4]}.jpg" for name in filenames],
+            "externalUrl": None,
+            "publishAt": timestamp,
+            "createdAt": timestamp,
+            "updatedAt": timestamp,
+            "version": 1
+        },
+        "relationships": [
+            {"id": str(uuid.uuid4()), "type": "scanlation_group"},
+            {"id": str(uuid.uuid4()), "type": "manga"},
+            {"id": str(uuid.uuid4()), "type": "user"}
+        ]
+    }
+
+def measure(payload: str, factory: typing.Callable[[dict], typing.Any]) -> tuple[int, int]:
+    """Return the retained and peak heap usage (in bytes) of decoding `payload` into chapter objects."""
+    gc.collect()
+    tracemalloc.start()
+
+    chapters = [factory(entry) for entry in ujson.loads(payload)]
+    gc.collect()
+
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del chapters
+    return retained, peak
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the heap usage of eager and compact Mangadex chapter objects.")
+    parser.add_argument("--chapters", type=int, default=2000)
+    parser.add_argument("--pages", type=int, default=20, help="Pages per chapter in the synthetic feed.")
+    arguments = parser.parse_args()
+
+    payload = ujson.dumps([chapter(i, arguments.pages) for i in range(arguments.chapters)])
+    before, before_peak = measure(payload, EagerChapter)
+    after, after_peak = measure(payload, mangadex.Chapter)
+
+    print(f"{arguments.chapters} chapters, {arguments.pages} pages each ({len(payload) / 1048576:.1f}MiB of JSON)")
+    print(f"{'eager (before)':<16} retained {before / 1048576:8.2f}MiB  peak {before_peak / 1048576:8.2f}MiB  {before / arguments.chapters:8.0f}B/chapter")
+    print(f"{'compact (after)':<16} retained {after / 1048576:8.2f}MiB  peak {after_peak / 1048576:8.2f}MiB  {after / arguments.chapters:8.0f}B/chapter")
+    print(f"{'reduction':<16} {100 * (1 - after / before):.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import database
+
+import motor.motor_asyncio as motor
+import dataclasses
+import statistics
+import argparse
+import datetime
+import asyncio
+import time
+import os
+
+async def measure(iterations: int, routine) -> list[float]:
+    """Return the latency of each call to `routine` in milliseconds."""
+    samples = []
+
+    for index in range(iterations):
+        start = time.perf_counter()
+        await routine(index)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return samples
+
+def summarise(name: str, samples: list[float]) -> str:
+    """Format the mean, median and 99th percentile of `samples`."""
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"{name:<40} mean {statistics.mean(ordered):8.3f}ms  p50 {statistics.median(ordered):8.3f}ms  p99 {p99:8.3f}ms"
+
+async def benchmark(name: str, engine: database.Engine, iterations: int) -> None:
+    """Benchmark the config-lookup and starboard-upsert paths of an engine."""
+    await engine.prepare()
+    guilds = 100
+
+    for identifier in range(guilds):
+        config = database.GuildConfiguration.new(identifier)
+        await engine.replace("guild_settings", "guild_id", dataclasses.asdict(config))
+
+    async def lookup(index: int) -> None:
+        await engine.find("guild_settings", "guild_id", index % guilds)
+
+    async def upsert(index: int) -> None:
+        document = {
+            "message_id": index % 500,
+            "author_id": 1,
+            "channel_id": 2,
+            "guild_id": index % guilds,
+            "reply_target_id": None,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc),
+            "message_content": "benchmark",
+            "attachment_urls": [],
+            "reaction_count": index
+        }
+
+        await engine.replace("starboarded_messages", "message_id", document)
+
+    print(summarise(f"{name}: config lookup", await measure(iterations, lookup)))
+    print(summarise(f"{name}: starboard upsert", await measure(iterations, upsert)))
+    await engine.close()
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare read/write latency of Bakerbot's storage engines.")
+    parser.add_argument("--mongodb", help="MongoDB address to benchmark (uses the `bakerbot_benchmark` database).")
+    parser.add_argument("--sqlite", default="benchmark.sqlite3", help="SQLite file to benchmark (deleted afterwards).")
+    parser.add_argument("--iterations", type=int, default=1000)
+    arguments = parser.parse_args()
+
+    try:
+        await benchmark("sqlite", database.SQLiteEngine(arguments.sqlite), arguments.iterations)
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(arguments.sqlite + suffix):
+                os.remove(arguments.sqlite + suffix)
+
+    if arguments.mongodb is not None:
+        client = motor.AsyncIOMotorClient(arguments.mongodb, serverSelectionTimeoutMS=2000)
+        await client.drop_database("bakerbot_benchmark")
+        await benchmark("mongodb", database.MongoEngine(client["bakerbot_benchmark"]), arguments.iterations)
+        await client.drop_database("bakerbot_benchmark")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 import utilities
+import network
 import model
 
 from discord.ext import commands
@@ -56,9 +57,80 @@ class Debugger(commands.Cog):
 
         await utilities.Commands.group(ctx, summary)
 
+    @debug.command()
+    async def db(self, ctx: commands.Context) -> None:
+        """Show MongoDB command latencies, failures, pool wait times and the slowest recent operations."""
+        monitor = self.bot.monitor
+        embed = utilities.Embeds.standard()
+        embed.title = "MongoDB command statistics"
+        embed.set_footer(text="Latency percentiles are upper bounds from power-of-two buckets.", icon_url=utilities.Icons.INFO)
+
+        with monitor.lock:
+            ranked = sorted(monitor.commands.items(), key=lambda i: i[1].total, reverse=True)
+            lines = [(f"{collection}.{operation}: {h.count} ops, {h.failures} failed, mean {h.mean():.1f}ms, "
+                      f"p50 ≤{h.percentile(0.5):.0f}ms, p99 ≤{h.percentile(0.99):.0f}ms, max {h.maximum:.1f}ms")
+                     for (collection, operation), h in ranked]
+
+            pool = monitor.pool
+            waits = f"{pool.count} checkouts, {pool.failures} failed, mean {pool.mean():.2f}ms, max {pool.maximum:.2f}ms"
+
+        if not lines:
+            embed.description = "No commands have been recorded (is the bot using MongoDB?)."
+            return await ctx.reply(embed=embed)
+
+        text = "\n".join(f" • {line}" for line in lines)
+        embed.description = utilities.Limits.limit(text, utilities.Limits.EMBED_DESCRIPTION)
+        embed.add_field(name="Connection pool waits", value=waits, inline=False)
+
+        for milliseconds, collection, operation, query in monitor.slowest(5):
+            name = utilities.Limits.limit(f"{milliseconds:.1f}ms: {collection}.{operation}", utilities.Limits.EMBED_FIELD_NAME)
+            value = utilities.Limits.limit(str(query), utilities.Limits.EMBED_FIELD_VALUE - 6)
+            embed.add_field(name=name, value=f"```{value}```", inline=False)
+
+        await ctx.reply(embed=embed)
+
+    @debug.command()
+    async def http(self, ctx: commands.Context) -> None:
+        """Show the state of each backend's circuit breaker and the HTTP transport's per-host rate limiters."""
+        embed = utilities.Embeds.standard()
+        embed.title = "HTTP transport statistics"
+        embed.set_footer(text="Latency percentiles are upper bounds from power-of-two buckets.", icon_url=utilities.Icons.INFO)
+
+        breakers = []
+        for name, endpoint in network.Transport.endpoints.items():
+            breaker = endpoint.breaker
+            state = breaker.state()
+            state = f"{state} ({breaker.remaining():.0f}s left)" if state == "open" else state
+            breakers.append(f" • {name}: {state}, {breaker.failures} consecutive failures, tripped {breaker.trips} times, {endpoint.retried} retries, {endpoint.coalesced} coalesced")
+
+        text = "\n".join(breakers) or "No endpoints have been registered."
+        embed.description = utilities.Limits.limit(text, utilities.Limits.EMBED_DESCRIPTION)
+
+        cache = network.Transport.cache
+        value = (f"{len(cache.entries)} entries, {cache.size / 1048576:.1f}/{cache.capacity / 1048576:.0f}MiB\n"
+                 f"{cache.hits} hits, {cache.misses} misses, {cache.revalidations} revalidated, {cache.evictions} evictions\n"
+                 f"Disk: {network.Transport.disk.hits} hits, {network.Transport.disk.misses} misses")
+
+        embed.add_field(name="Response cache", value=value, inline=False)
+
+        for host, bucket in network.Transport.buckets.items():
+            bucket.refill()
+            waits = bucket.waits
+            value = (f"Budget: {bucket.rate:.2f} requests/s (burst {bucket.capacity}), {bucket.tokens:.1f} tokens available\n"
+                     f"Queue: {bucket.queued} waiting now, {bucket.peak} at peak\n"
+                     f"Waits: {waits.count} requests, mean {waits.mean():.1f}ms, p99 ≤{waits.percentile(0.99):.0f}ms, max {waits.maximum:.1f}ms")
+
+            embed.add_field(name=host, value=value, inline=False)
+
+        await ctx.reply(embed=embed)
+
     @commands.Cog.listener()
     async def on_command_error(self, ctx: commands.Context, error: commands.CommandError) -> None:
         """Catches any exceptions thrown from commands and forwards them to Discord."""
+        # Cogs mark errors they've already reported themselves (in `cog_command_error`).
+        if getattr(ctx, "handled", False):
+            return
+
         if isinstance(error, commands.CommandInvokeError):
             error = error.original
 
@@ -81,6 +153,12 @@ class Debugger(commands.Cog):
             fail.set_footer(text=f"Command signature: {template}", icon_url=utilities.Icons.CROSS)
             await ctx.reply(embed=fail)
 
+        elif isinstance(error, network.CircuitOpen):
+            fail = utilities.Embeds.status(False)
+            fail.description = f"The {error.name} API is currently unavailable, so your command wasn't run."
+            fail.set_footer(text=f"Try again in {error.remaining:.0f} seconds.", icon_url=utilities.Icons.CROSS)
+            await ctx.reply(embed=fail)
+
         elif isinstance(error, (commands.CheckFailure, commands.CheckAnyFailure)):
             fail = utilities.Embeds.status(False)
             fail.description = "The current context does not support execution of this command."
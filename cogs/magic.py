@@ -1,4 +1,5 @@
 from backends import expcord
+from cogs import management
 import utilities
 import model
 
@@ -109,7 +110,7 @@ class PersonalNotificationSystem:
         self.bot = bot
         self.guild = guild_id
         self.identifiers = set([212076374226108417])
-        bot.add_listener(self.on_message)
+        bot.add_listener(self.on_message_context)
 
     def identifier_check(self, message: discord.Message) -> bool:
         """Check whether tracked users are mentioned or replied to."""
@@ -122,14 +123,15 @@ class PersonalNotificationSystem:
                 embed = utilities.Embeds.package(message)
                 await user.send(embed=embed)
 
-    async def on_message(self, message: discord.Message) -> None:
+    async def on_message_context(self, context: management.MessageContext) -> None:
         """Track each message and post mentioned messages to each person's inbox."""
+        message = context.message
+
         if message.guild is not None and message.guild.id == self.guild:
             if self.identifier_check(message):
                 await self.post(message)
 
-            elif message.reference is not None and message.reference.message_id is not None:
-                resolved = await message.channel.fetch_message(message.reference.message_id)
+            elif (resolved := await context.reference()) is not None:
                 if self.identifier_check(resolved):
                     await self.post(resolved)
 
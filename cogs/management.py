@@ -3,6 +3,7 @@ import database
 import model
 
 from discord.ext import commands
+import dataclasses
 import discord
 import random
 
@@ -77,12 +78,13 @@ class Management(commands.Cog):
         await config.write()
         await ctx.reply(f"The message autoreply system has been {word_to_use}.")
 
-    async def who_asked(self, message: discord.Message) -> None:
+    async def who_asked(self, context: "MessageContext") -> None:
         """Handle the "ok but who asked?" reply feature."""
-        if message.author.id != self.bot.user.id and message.guild is not None:
-            if (config := await database.GuildConfiguration.get(message.guild.id)) is not None:
-                if config.who_asked_enabled and random.randint(0, 1000) == 0:
-                    await message.reply("ok but who asked?")
+        message = context.message
+
+        if message.author.id != self.bot.user.id and context.config is not None and not context.ignored:
+            if context.config.who_asked_enabled and random.randint(0, 1000) == 0:
+                await message.reply("ok but who asked?")
 
     async def message_resender(self, message: discord.Message) -> None:
         """Handle the message resending feature."""
@@ -93,26 +95,73 @@ class Management(commands.Cog):
                     await message.reply(embed=embed)
 
     @commands.Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
+    async def on_message_context(self, context: "MessageContext") -> None:
         """Call relevant subroutines when a message is received."""
-        await self.who_asked(message)
+        await self.who_asked(context)
 
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message) -> None:
         """Call relevant subroutines when a message is deleted."""
         await self.message_resender(message)
 
+@dataclasses.dataclass
+class MessageContext:
+    """Per-message state that is resolved once and shared with every `on_message_context` listener."""
+    message: discord.Message
+    config: database.GuildConfiguration | None
+    ignored: bool
+    prefixed: bool
+    reply: discord.Message | None
+    fetched: bool = False
+
+    @classmethod
+    async def build(cls, bot: model.Bakerbot, message: discord.Message, prefixed: bool) -> "MessageContext":
+        """Resolve the guild configuration and reply target for `message` without making any REST calls."""
+        config = None
+        ignored = False
+
+        if message.guild is not None:
+            config = await database.GuildConfiguration.get(message.guild.id)
+            ignored = config is None or message.channel.id in config.ignored_channels
+
+        reply = None
+        if (ref := message.reference) is not None:
+            if isinstance(ref.resolved, discord.Message):
+                reply = ref.resolved
+            elif ref.message_id is not None:
+                reply = ref.cached_message
+
+        return cls(message=message, config=config, ignored=ignored, prefixed=prefixed, reply=reply)
+
+    async def reference(self) -> discord.Message | None:
+        """Return the message being replied to, only fetching it from Discord as a last resort."""
+        ref = self.message.reference
+
+        if self.reply is None and not self.fetched and ref is not None and ref.message_id is not None:
+            # Only ever try the REST call once, even if several listeners need the reply.
+            self.fetched = True
+
+            try:
+                self.reply = await self.message.channel.fetch_message(ref.message_id)
+            except discord.HTTPException:
+                pass
+
+        return self.reply
+
 def setup(bot: model.Bakerbot) -> None:
     cog = Management(bot)
     bot.add_cog(cog)
 
     async def on_message(message: discord.Message) -> None:
-        """Bot-wide message handler to enforce guild-ignored channels."""
-        if message.guild is not None:
-            config = await database.GuildConfiguration.get(message.guild.id)
-            if config is None or message.channel.id in config.ignored_channels:
-                return
-
-        await bot.process_commands(message)
+        """Bot-wide message handler: resolves per-message state once and enforces guild-ignored channels."""
+        prefix = await bot.get_prefix(message)
+        prefixed = message.content.startswith(tuple(prefix) if isinstance(prefix, list) else prefix)
+        context = await MessageContext.build(bot, message, prefixed)
+        bot.dispatch("message_context", context)
+
+        # Building a command context is comparatively expensive, so only messages that could be commands pay for it.
+        if context.prefixed and not context.ignored and not message.author.bot:
+            ctx = await bot.get_context(message)
+            await bot.invoke(ctx)
 
     bot.on_message = on_message
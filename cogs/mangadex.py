@@ -1,16 +1,42 @@
 from backends import mangadex
+import exceptions
 import utilities
+import database
+import network
 import model
 
-from discord.ext import commands
+from discord.ext import commands, tasks
+import dataclasses
 import titlecase
+import logging
+import tempfile
 import discord
+import asyncio
+import aiohttp
+import pymongo
+import sqlite3
+import zipfile
 import typing
+import time
+import re
+
+logger = logging.getLogger(__name__)
 
 class Mangadex(commands.Cog):
     """Bakerbot's implementation of the Mangadex API (v5)."""
     def __init__(self, bot: model.Bakerbot) -> None:
         self.bot = bot
+        self.loaders: set[asyncio.Task] = set()
+        self.warm = bot.secrets.get("mangadex-prefetch-pages", 0)
+
+        # Followed series are loaded once and kept here, so picking the ones that are due doesn't touch the database.
+        self.series: dict[str, database.MangaSeries] | None = None
+        self.following = asyncio.Lock()
+
+        # Transient failures make the poller retry (with backoff) instead of stopping it.
+        errors = (aiohttp.ClientError, asyncio.TimeoutError, exceptions.HTTPUnexpected, network.CircuitOpen, pymongo.errors.PyMongoError, sqlite3.Error)
+        self.poller.add_exception_type(*errors)
+        self.poller.start()
 
     def optional_titlecase(self, string: str | None, default: str) -> str:
         """Optionally apply a titlecase transformation on `string`, else return the default."""
@@ -19,6 +45,235 @@ class Mangadex(commands.Cog):
 
         return default
 
+    async def cog_command_error(self, ctx: commands.Context, error: commands.CommandError) -> None:
+        """Report searches that didn't find anything, along with any similar titles that have been seen."""
+        if isinstance(error, commands.CommandInvokeError):
+            error = error.original
+
+        if isinstance(error, mangadex.NoResults):
+            fail = utilities.Embeds.status(False)
+            fail.description = f"No manga called {error.query} could be found."
+            suggestions = ", ".join(error.suggestions) or "no similar titles have been seen yet"
+            footer = utilities.Limits.limit(f"Did you mean: {suggestions}?", utilities.Limits.EMBED_FOOTER_TEXT)
+            fail.set_footer(text=footer, icon_url=utilities.Icons.CROSS)
+            await ctx.reply(embed=fail)
+
+            # Stops the debugger from reporting it again.
+            ctx.handled = True
+
+    def cog_unload(self) -> None:
+        self.poller.cancel()
+        for task in self.loaders:
+            task.cancel()
+
+    def split_chapter(self, query: str) -> tuple[str, str | None]:
+        """Split a trailing chapter number off the end of `query`, returning the title and the number (if any)."""
+        title, _, number = query.rpartition(" ")
+        if title and re.fullmatch(r"\d+(\.\d+)?", number):
+            return title, number
+
+        return query, None
+
+    async def resolve(self, query: str) -> tuple[mangadex.Manga, str | None]:
+        """Return the manga that `query` refers to, and the chapter number at the end of it (if any)."""
+        title, number = self.split_chapter(query)
+        manga = await mangadex.Backend.manga(title)
+
+        # Some titles end in a number themselves (e.g. "Kaiju No. 8").
+        if number is not None and query.casefold() in (t.casefold() for t in (manga.title, *manga.alt_titles)):
+            return manga, None
+
+        return manga, number
+
+    async def index(self, manga: mangadex.Manga) -> mangadex.ChapterIndex:
+        """Return an index of every English chapter of `manga` (this loads the whole feed)."""
+        await manga.feed(language="en")
+        return mangadex.ChapterIndex.build(manga.chapters)
+
+    def missing(self, manga: mangadex.Manga, number: str, index: mangadex.ChapterIndex) -> discord.Embed:
+        """Return an embed explaining that `manga` has no chapter `number`, listing the nearest ones."""
+        nearest = ", ".join(c.chapter for c in index.nearest(number)) or "none"
+        fail = utilities.Embeds.status(False)
+        fail.description = f"{manga.title} doesn't have a chapter {number} in English."
+        fail.set_footer(text=f"Nearest chapters: {nearest}.", icon_url=utilities.Icons.CROSS)
+        return fail
+
+    def chapter_options(self, entries: list[tuple[tuple[float, float, int], mangadex.Chapter]]) -> list[discord.SelectOption]:
+        """Return a select option for each chapter (valued by its key in the chapter index)."""
+        options = []
+        available = []
+
+        for key, chapter in entries:
+            if chapter.volume is not None:
+                available.append(f"Volume {chapter.volume}")
+            if chapter.chapter is not None:
+                available.append(f"Chapter {chapter.chapter}")
+
+            description = ", ".join(available) or "No chapter/volume number available."
+            label = utilities.Limits.limit(chapter.title or description, utilities.Limits.SELECT_LABEL)
+            value = utilities.Limits.limit(description, utilities.Limits.SELECT_DESCRIPTION)
+            option = discord.SelectOption(label=label, value=mangadex.ChapterIndex.encode(key), description=value)
+            options.append(option)
+            available.clear()
+
+        return options
+
+    def loading(self, loaded: int, total: int, failed: bool=False) -> str:
+        """Return the chapter selector's message, including a loading indicator if the feed is still streaming in."""
+        if failed:
+            return f"Select a chapter to start reading (only {loaded}/{total} chapters could be loaded, try again later for the rest)."
+
+        if loaded < total:
+            return f"Select a chapter to start reading (loading {loaded}/{total} chapters)."
+
+        return "Select a chapter to start reading."
+
+    def finished(self, task: asyncio.Task) -> None:
+        """Forget a finished loader task, logging it if it failed."""
+        self.loaders.discard(task)
+
+        if not task.cancelled() and (error := task.exception()) is not None:
+            logger.error("Mangadex chapter loader %s failed.", task.get_name(), exc_info=error)
+
+    async def stream_chapters(self, manga: mangadex.Manga, stream: typing.AsyncIterator, index: mangadex.ChapterIndex, paginator: utilities.Paginator, progress: asyncio.Queue, loaded: int, total: int) -> None:
+        """Index chapters and append them to the paginator as the rest of the feed streams in."""
+        try:
+            async for chapters, total in stream:
+                for option in self.chapter_options(index.extend(chapters)):
+                    paginator.add(option)
+
+                loaded += len(chapters)
+                progress.put_nowait((loaded, total, False))
+        except (aiohttp.ClientError, asyncio.TimeoutError, exceptions.HTTPUnexpected, network.CircuitOpen) as error:
+            # The chapters loaded so far are still usable, but the selector shouldn't claim the rest are coming.
+            logger.warning("Failed to load the feed of %s.", manga.identifier, exc_info=error)
+            progress.put_nowait((loaded, total, True))
+            return
+
+        # The preferred group was picked from the first page only, the whole feed might favour someone else.
+        index.prefer(mangadex.ChapterIndex.favourite(manga.chapters), manga.chapters)
+
+    async def show_progress(self, paginator: utilities.Paginator, message: discord.Message, progress: asyncio.Queue) -> None:
+        """Keep the chapter selector's message up to date until `None` is queued (or loading fails)."""
+        while (update := await progress.get()) is not None:
+            # Only the latest progress is worth showing if several pages arrived during the last edit.
+            while not progress.empty() and update is not None:
+                update = progress.get_nowait()
+
+            if update is None:
+                return
+
+            paginator.display()
+            await message.edit(content=self.loading(*update), view=paginator)
+
+            # Nothing else will arrive once loading has failed.
+            if update[2]:
+                return
+
+    def describe(self, chapter: mangadex.Chapter) -> str:
+        """Return a short, human-readable name for a chapter."""
+        if chapter.chapter is not None:
+            return f"Chapter {chapter.chapter}: {chapter.title}" if chapter.title else f"Chapter {chapter.chapter}"
+
+        return chapter.title or "Oneshot"
+
+    def announcement(self, follow: database.MangaFollow, chapters: list[mangadex.Chapter]) -> discord.Embed:
+        """Return an embed announcing new chapters of a followed manga."""
+        client = mangadex.Backend.client
+        lines = [f"[{self.describe(c)}]({client}/chapter/{c.identifier})" for c in chapters[:10]]
+        if len(chapters) > 10:
+            lines.append(f"...and {len(chapters) - 10} more.")
+
+        embed = utilities.Embeds.standard()
+        embed.title = f"Mangadex: {follow.title}"
+        embed.url = f"{client}/title/{follow.manga_id}"
+        embed.description = "\n".join(lines)
+        embed.set_footer(text="New chapter(s) from a followed manga.", icon_url=utilities.Icons.INFO)
+        return embed
+
+    async def check(self, due: list[database.MangaSeries]) -> tuple[dict[str, list[mangadex.Chapter]], list[database.MangaSeries]]:
+        """Poll up to 100 series that are due with a single batched query, returning any new chapters and the advanced series."""
+        now = time.time()
+        since = min(series.watermark for series in due)
+        watermark = since
+        released: dict[str, list[mangadex.Chapter]] = {}
+        watermarks = {series.manga_id: series.watermark for series in due}
+
+        async for chapters in mangadex.Backend.updates(list(watermarks), since):
+            for chapter in chapters:
+                # Edits to old chapters bump their `updatedAt` too, only chapters created past a series' own watermark are new.
+                watermark = max(watermark, chapter.updated_at[:19])
+                if chapter.manga in watermarks and chapter.created_at[:19] > watermarks[chapter.manga]:
+                    released.setdefault(chapter.manga, []).append(chapter)
+
+        # Everything up to the newest `updatedAt` has been seen, so every polled series can move up to it.
+        # Copies are returned so nothing changes until the caller commits them.
+        updated = [dataclasses.replace(series) for series in due]
+        for series in updated:
+            series.watermark = max(series.watermark, watermark)
+            series.schedule(now, series.manga_id in released)
+
+        return released, updated
+
+    async def announce(self, follows: list[database.MangaFollow], released: dict[str, list[mangadex.Chapter]]) -> None:
+        """Post the new chapters of each followed manga in the channels that follow it."""
+        for follow in follows:
+            if (channel := self.bot.get_channel(follow.channel_id)) is None:
+                continue
+
+            embed = self.announcement(follow, released[follow.manga_id])
+
+            try:
+                await channel.send(embed=embed)
+            except discord.HTTPException:
+                # The channel probably can't be posted in anymore, the other channels should still get theirs.
+                continue
+
+    async def poll(self) -> None:
+        """Announce new chapters of followed manga, then advance the watermarks of every series that was polled."""
+        async with self.following:
+            try:
+                if self.series is None:
+                    self.series = {s.manga_id: s for s in await database.MangaSeries.all()}
+            except database.DatabaseNotConnected:
+                return
+
+            now = time.time()
+            due = [series for series in self.series.values() if series.due <= now]
+            released = {}
+            updated = []
+
+            # Every batch is polled before anything is committed, so a failing batch means the whole cycle is retried
+            # from the old watermarks (instead of the earlier batches' chapters being skipped).
+            for start in range(0, len(due), 100):
+                chapters, series = await self.check(due[start:start + 100])
+                released |= chapters
+                updated.extend(series)
+
+            if released:
+                try:
+                    follows = await database.MangaFollow.following(list(released))
+                except database.DatabaseNotConnected:
+                    return
+
+                await self.announce(follows, released)
+
+            # Watermarks only move once the chapters have been announced, so they're never skipped (at worst, a failed
+            # write means they're announced twice).
+            if updated:
+                await database.MangaSeries.write_many(updated)
+                self.series.update((series.manga_id, series) for series in updated)
+
+    @tasks.loop(minutes=5)
+    async def poller(self) -> None:
+        """Announce new chapters of followed manga (only series that are due are polled, in batches)."""
+        await self.poll()
+
+    @poller.before_loop
+    async def before_poller(self) -> None:
+        """Wait until the bot is ready before polling for new chapters."""
+        await self.bot.wait_until_ready()
+
     @commands.group(invoke_without_subcommand=True)
     async def manga(self, ctx: commands.Context) -> None:
         """The parent command for the manga reader."""
@@ -49,8 +304,9 @@ class Mangadex(commands.Cog):
             embed.set_thumbnail(url=cover)
 
         embed.add_field(name="🗿  Author", value=author)
-        genres = ", ".join(tag.name for tag in manga.tags) or "No genres available."
-        tgenre = "📖  Genres" if len(manga.tags) > 1 else "📖  Genre"
+        tags = manga.tags
+        genres = ", ".join(tag.name for tag in tags) or "No genres available."
+        tgenre = "📖  Genres" if len(tags) > 1 else "📖  Genre"
         embed.add_field(name=tgenre, value=genres)
 
         demographic = self.optional_titlecase(manga.demographic, "Unknown demographic.")
@@ -64,58 +320,381 @@ class Mangadex(commands.Cog):
         await ctx.reply(embed=embed)
 
     @manga.command()
-    async def read(self, ctx: commands.Context, *, title: str) -> None:
-        """Initialise an instance of Bakerbot's manga reader."""
+    async def read(self, ctx: commands.Context, *, query: str) -> None:
+        """Initialise an instance of Bakerbot's manga reader (usage: `$manga read <title> [chapter]`)."""
         async with ctx.typing():
-            manga = await mangadex.Backend.manga(title)
-            await manga.aggregate(language="en")
-            await manga.feed(language="en")
+            manga, number = await self.resolve(query)
+
+            if number is not None:
+                # Jumping straight to a chapter needs the whole index, so skip the selector.
+                index = await self.index(manga)
+
+                if (position := index.find(number)) is None:
+                    return await ctx.reply(embed=self.missing(manga, number, index))
+
+                message = await ctx.reply(f"Opening chapter {number}.")
+                reader = MangaReaderView(manga, index, position, warm=self.warm)
+                return await reader.run(message)
 
+            stream = manga.stream(language="en")
+            chapters, total = await anext(stream)
+
+        # Show the selector as soon as the first page of the feed arrives and stream in the rest.
+        index = mangadex.ChapterIndex.build(chapters)
         paginator = utilities.Paginator()
         paginator.placeholder = "Manga chapters: Options"
-        available = []
-
-        for index, chapter in enumerate(manga.chapters):
-            if chapter.volume is not None:
-                available.append(f"Volume {chapter.volume}")
-            if chapter.chapter is not None:
-                available.append(f"Chapter {chapter.chapter}")
 
-            description = ", ".join(available) or "No chapter/volume number available."
-            label = utilities.Limits.limit(chapter.title or description, utilities.Limits.SELECT_LABEL)
-            value = utilities.Limits.limit(description, utilities.Limits.SELECT_DESCRIPTION)
-            option = discord.SelectOption(label=label, value=str(index), description=value)
+        for option in self.chapter_options(list(zip(index.keys, index.chapters))):
             paginator.add(option)
-            available.clear()
 
-        message = await ctx.reply("Select a chapter to start reading.", view=paginator)
-        if (choice := await paginator.wait()) is not None:
-            reader = MangaReaderView(manga, int(choice))
+        message = await ctx.reply(self.loading(len(chapters), total), view=paginator)
+        progress = asyncio.Queue()
+        loader = asyncio.create_task(self.stream_chapters(manga, stream, index, paginator, progress, len(chapters), total), name="mangadex-feed")
+        display = asyncio.create_task(self.show_progress(paginator, message, progress), name="mangadex-selector")
+
+        for task in (loader, display):
+            self.loaders.add(task)
+            task.add_done_callback(self.finished)
+
+        choice = await paginator.wait()
+
+        # Wait for any edit in flight to finish (so it can't land on top of the reader) and stop updating the selector.
+        progress.put_nowait(None)
+        await asyncio.gather(display, return_exceptions=True)
+
+        if choice is None:
+            # Nobody picked a chapter, so there's no point paging through the rest of the feed.
+            loader.cancel()
+            return
+
+        # The loader keeps filling in the index for the reader, until the reader is done with it.
+        position = index.position(mangadex.ChapterIndex.decode(choice))
+        reader = MangaReaderView(manga, index, position, warm=self.warm)
+
+        try:
             await reader.run(message)
+            await reader.wait()
+        finally:
+            loader.cancel()
+
+    @manga.command()
+    async def download(self, ctx: commands.Context, *, query: str) -> None:
+        """Download a chapter as a CBZ archive (usage: `$manga download <title> <chapter>`)."""
+        async with ctx.typing():
+            manga, number = await self.resolve(query)
+
+            if number is None:
+                fail = utilities.Embeds.status(False)
+                fail.description = "Specify the chapter to download after the title."
+                fail.set_footer(text="For example: $manga download oshi no ko 12", icon_url=utilities.Icons.CROSS)
+                return await ctx.reply(embed=fail)
+
+            # Use the same release as `$manga read` would (the preferred group's, if it has one).
+            index = await self.index(manga)
+            if (position := index.find(number)) is None:
+                return await ctx.reply(embed=self.missing(manga, number, index))
+
+            chapter = index[position]
+            if chapter.external_url is not None:
+                # Some chapters are only hosted on the publisher's site, so there are no pages to download.
+                fail = utilities.Embeds.status(False)
+                fail.description = f"Chapter {number} of {manga.title} is hosted externally, [read it here]({chapter.external_url})."
+                fail.set_footer(text="Only chapters hosted on Mangadex can be downloaded.", icon_url=utilities.Icons.CROSS)
+                return await ctx.reply(embed=fail)
+
+            # Leave some room for the multipart request around each file.
+            limit = ctx.guild.filesize_limit if ctx.guild is not None else 8 * 1024 * 1024
+            bundle = ChapterBundle(f"{manga.title} - Chapter {number}", limit - 64 * 1024)
+
+            start = time.perf_counter()
+            await bundle.fill(chapter)
+            elapsed = time.perf_counter() - start
+            files = bundle.files()
+
+        megabytes = bundle.total / 1048576
+        summary = (f"Downloaded {len(chapter.data)} pages ({megabytes:.1f}MiB) in {elapsed:.1f}s "
+                   f"({megabytes / elapsed:.2f}MiB/s), split into {len(files)} part(s).")
+
+        # Each part is as large as a message allows, so they have to be sent separately.
+        for part, file in enumerate(files):
+            await ctx.reply(summary if part == 0 else None, file=file)
+
+    @manga.command()
+    async def follow(self, ctx: commands.Context, *, title: str) -> None:
+        """Post new chapters of a manga in this channel as they come out."""
+        async with ctx.typing():
+            manga = await mangadex.Backend.manga(title)
+
+            async with self.following:
+                if await database.MangaFollow.get(ctx.channel.id, manga.identifier) is not None:
+                    fail = utilities.Embeds.status(False)
+                    fail.description = f"This channel already follows {manga.title}."
+                    return await ctx.reply(embed=fail)
+
+                follow = database.MangaFollow.new(ctx.channel, manga.identifier, manga.title)
+                await follow.write()
+
+                # Series are shared by every channel that follows them, so only the first follow starts tracking it.
+                if (series := await database.MangaSeries.get(manga.identifier)) is None:
+                    series = database.MangaSeries.new(manga.identifier, manga.title, time.time())
+                    await series.write()
+
+                if self.series is not None:
+                    self.series[series.manga_id] = series
+
+        embed = utilities.Embeds.status(True)
+        embed.description = f"New chapters of {manga.title} will be posted in this channel."
+        await ctx.reply(embed=embed)
+
+    @manga.command()
+    async def unfollow(self, ctx: commands.Context, *, title: str) -> None:
+        """Stop posting new chapters of a manga in this channel."""
+        async with ctx.typing():
+            follows = await database.MangaFollow.channel(ctx.channel.id)
+            follow = next((f for f in follows if f.title.casefold() == title.casefold()), None)
+
+            # Fall back to searching Mangadex if the title wasn't given exactly.
+            if follow is None:
+                manga = await mangadex.Backend.manga(title)
+                follow = next((f for f in follows if f.manga_id == manga.identifier), None)
+
+            if follow is None:
+                fail = utilities.Embeds.status(False)
+                fail.description = f"This channel doesn't follow {title}."
+                fail.set_footer(text="Try $manga follows to see what this channel follows.", icon_url=utilities.Icons.CROSS)
+                return await ctx.reply(embed=fail)
+
+            async with self.following:
+                await follow.delete()
+
+                # Stop polling the series once nothing follows it anymore.
+                if not await database.MangaFollow.following([follow.manga_id]):
+                    if (series := await database.MangaSeries.get(follow.manga_id)) is not None:
+                        await series.delete()
+
+                    if self.series is not None:
+                        self.series.pop(follow.manga_id, None)
+
+        embed = utilities.Embeds.status(True)
+        embed.description = f"New chapters of {follow.title} will no longer be posted in this channel."
+        await ctx.reply(embed=embed)
+
+    @manga.command()
+    async def follows(self, ctx: commands.Context) -> None:
+        """List the manga that this channel follows."""
+        follows = await database.MangaFollow.channel(ctx.channel.id)
+        client = mangadex.Backend.client
+
+        embed = utilities.Embeds.standard()
+        embed.title = "Mangadex: Followed Manga"
+        embed.description = "\n".join(f"[{f.title}]({client}/title/{f.manga_id})" for f in follows) or "This channel doesn't follow any manga."
+        embed.description = utilities.Limits.limit(embed.description, utilities.Limits.EMBED_DESCRIPTION)
+        embed.set_footer(text="Use $manga follow <title> to follow another.", icon_url=utilities.Icons.INFO)
+        await ctx.reply(embed=embed)
+
+class ChapterBundle:
+    """A CBZ archive of a chapter's pages, split into parts that each fit within an upload limit."""
+    def __init__(self, name: str, limit: int, concurrency: int=4) -> None:
+        self.name = name
+        self.limit = limit
+        self.concurrency = concurrency
+        self.parts: list[typing.IO[bytes]] = []
+        self.archive: zipfile.ZipFile | None = None
+        self.size = 0
+        self.total = 0
+        self.largest = 0
+
+    def rotate(self) -> None:
+        """Finish the current part and start a new one (parts live in temporary files, not memory)."""
+        if self.archive is not None:
+            self.archive.close()
+
+        file = tempfile.TemporaryFile()
+        self.parts.append(file)
+        self.archive = zipfile.ZipFile(file, "w", zipfile.ZIP_STORED)
+        self.size = 0
+
+    def begin(self, filename: str, size: int) -> typing.IO[bytes]:
+        """Open an entry for a page of about `size` bytes in the current part, starting a new part if it wouldn't fit."""
+        # Local header, central directory entry and end of archive record.
+        size += 2 * len(filename) + 128
+        if self.archive is None or (self.size > 0 and self.size + size > self.limit):
+            self.rotate()
+
+        # Images are already compressed, so store them as-is.
+        self.size += size
+        return self.archive.open(filename, "w")
+
+    def finish(self, entry: typing.IO[bytes], estimate: int, written: int) -> None:
+        """Finish writing an entry, correcting the part's size if the page's size was only an estimate."""
+        entry.close()
+        self.size += written - estimate
+        self.total += written
+        self.largest = max(self.largest, written)
+
+    async def receive(self, queue: asyncio.Queue) -> typing.Any:
+        """Return the next item from a page's queue, raising the exception instead if its download failed."""
+        item = await queue.get()
+        if isinstance(item, Exception):
+            raise item
+
+        return item
+
+    async def fill(self, chapter: mangadex.Chapter) -> None:
+        """Download every page of `chapter` into the archive, a bounded number at a time."""
+        if chapter.stale():
+            await chapter.base()
+
+        # Pages are written in order (so each part holds a contiguous run of pages), the page being written streams straight
+        # into its entry and pages further ahead queue up their chunks. Slots are only given back once a page has been
+        # written, so at most `concurrency` pages are ever held in memory, and never twice.
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queues = [asyncio.Queue() for _ in chapter.data]
+
+        async def download(index: int) -> None:
+            await semaphore.acquire()
+            queue = queues[index]
+
+            try:
+                async with chapter.stream(index) as response:
+                    queue.put_nowait(response.content_length)
+                    async for chunk in response.content.iter_chunked(65536):
+                        queue.put_nowait(chunk)
+            except Exception as error:
+                queue.put_nowait(error)
+            else:
+                queue.put_nowait(None)
+
+        tasks = [asyncio.create_task(download(index)) for index in range(len(queues))]
+        digits = len(str(len(tasks)))
+
+        try:
+            for index, queue in enumerate(queues):
+                # The CDN sends each page's length up front, fall back to the largest page so far if it doesn't.
+                estimate = await self.receive(queue) or self.largest
+                extension = chapter.data[index].rpartition(".")[2]
+                entry = await asyncio.to_thread(self.begin, f"{index + 1:0{digits}}.{extension}", estimate)
+                written = 0
+
+                try:
+                    while (chunk := await self.receive(queue)) is not None:
+                        await asyncio.to_thread(entry.write, chunk)
+                        written += len(chunk)
+                finally:
+                    await asyncio.to_thread(self.finish, entry, estimate, written)
+
+                semaphore.release()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            if self.archive is not None:
+                self.archive.close()
+
+    def files(self) -> list[discord.File]:
+        """Return each part of the archive as a file that can be uploaded."""
+        files = []
+        for index, part in enumerate(self.parts):
+            part.seek(0)
+            suffix = f" (part {index + 1} of {len(self.parts)})" if len(self.parts) > 1 else ""
+            files.append(discord.File(part, filename=f"{self.name}{suffix}.cbz"))
+
+        return files
 
 class MangaReaderView(utilities.View):
     """A manga reader view that can be used to navigate through a manga's chapters."""
-    def __init__(self, manga: mangadex.Manga, index: int, *args: typing.Any, **kwargs: typing.Any) -> None:
+    def __init__(self, manga: mangadex.Manga, chapters: mangadex.ChapterIndex, position: int, *args: typing.Any, warm: int=0, **kwargs: typing.Any) -> None:
         super().__init__(*args, **kwargs)
         self.manga = manga
-        self.current_chapter = index
+        self.chapters = chapters
         self.chapter_index = 0
 
-    async def get_current_page(self) -> str:
-        """Return the current image pointed to by the chapter and index cursors."""
-        chapter = self.manga.chapters[self.current_chapter]
-        page = chapter.data_saver[self.chapter_index]
+        # Positions shift while the rest of the feed is indexed, so the chapter is tracked by its key.
+        # The release being read is kept too, in case the index swaps in another group's release of it.
+        self.key = chapters.keys[position]
+        self.chapter = chapters[position]
+
+        # Batch mode shows as many pages as fit in one message, instead of one at a time.
+        self.batched = False
+
+        # The number of upcoming pages to download in the background (so the CDN has them ready).
+        self.warm = warm
+        self.warmed: set[str] = set()
+        self.tasks: set[asyncio.Task] = set()
+
+    async def prefetch(self) -> None:
+        """Refresh the base URLs of the current and adjacent chapters, then optionally warm the next few pages."""
+        chapters = self.chapters
+        position = self.position()
+        nearby = [self.chapter, *(chapters[i] for i in (position - 1, position + 1) if 0 <= i < len(chapters))]
+        await asyncio.gather(*(chapter.base() for chapter in nearby if chapter.stale()), return_exceptions=True)
+
+        chapter = self.chapter
+        if self.warm > 0 and not chapter.stale():
+            begin = self.chapter_index + self.step()
+            end = min(begin + self.warm, len(chapter.data_saver))
+            urls = [chapter.page(index) for index in range(begin, end)]
+            urls = [url for url in urls if url not in self.warmed]
+            self.warmed.update(urls)
+            await asyncio.gather(*(network.Transport.touch(url) for url in urls))
+
+    async def on_timeout(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+
+    def position(self) -> int:
+        """Return the current chapter's position in the index."""
+        return self.chapters.position(self.key)
+
+    def move(self, position: int) -> None:
+        """Switch to the chapter at `position` in the index, starting from its first page."""
+        self.key = self.chapters.keys[position]
+        self.chapter = self.chapters[position]
+        self.chapter_index = 0
+
+    def step(self) -> int:
+        """Return the number of pages shown at once."""
+        return utilities.Limits.MESSAGE_EMBEDS if self.batched else 1
+
+    def page_count(self) -> int:
+        """Return the number of pages in the current chapter (the chapter's base URL must be populated)."""
+        return len(self.chapter.data_saver)
 
-        if chapter.base_url is None:
+    async def render(self) -> dict[str, typing.Any]:
+        """Return the message contents for the current page (or batch of pages)."""
+        chapter = self.chapter
+        if chapter.stale():
             await chapter.base()
 
+        # Get the chapters around this one ready in the background, so page turns don't wait on the API.
+        task = asyncio.create_task(self.prefetch())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
         # Use data saver so clients don't spend so much time downloading image data.
-        return f"{chapter.base_url}/data-saver/{chapter.hash}/{page}"
+        if not self.batched:
+            return {"content": chapter.page(self.chapter_index), "embeds": []}
+
+        embeds = []
+        count = len(chapter.data_saver)
+
+        for index in range(self.chapter_index, min(self.chapter_index + self.step(), count)):
+            embed = utilities.Embeds.standard()
+            embed.set_image(url=chapter.page(index))
+            embed.set_footer(text=f"Page {index + 1} of {count}.", icon_url=utilities.Icons.INFO)
+            embeds.append(embed)
+
+        return {"content": None, "embeds": embeds}
+
+    async def show(self, interaction: discord.Interaction) -> None:
+        """Display the current page (or batch of pages) in response to an interaction."""
+        contents = await self.render()
+        await interaction.response.edit_message(**contents, view=self)
 
     async def run(self, message: discord.Message) -> None:
         """Start the manga reader using `message` as the output."""
-        link = await self.get_current_page()
-        await message.edit(content=link, view=self)
+        contents = await self.render()
+        await message.edit(**contents, view=self)
 
     @discord.ui.button(label="First")
     async def first(self, button: discord.ui.Button, interaction: discord.Interaction) -> None:
@@ -125,67 +704,69 @@ class MangaReaderView(utilities.View):
             return await interaction.response.send_message(content=error, ephemeral=True)
 
         self.chapter_index = 0
-        link = await self.get_current_page()
-        await interaction.response.edit_message(content=link)
+        await self.show(interaction)
 
     @discord.ui.button(label="Previous")
     async def previous(self, button: discord.ui.Button, interaction: discord.Interaction) -> None:
-        """Handle requests to move back one page."""
+        """Handle requests to move back one page (or batch of pages)."""
         if self.chapter_index < 1:
             error = "You're already at the first page!"
             return await interaction.response.send_message(content=error, ephemeral=True)
 
-        self.chapter_index -= 1
-        link = await self.get_current_page()
-        await interaction.response.edit_message(content=link)
+        self.chapter_index = max(0, self.chapter_index - self.step())
+        await self.show(interaction)
 
     @discord.ui.button(label="Next")
     async def next(self, button: discord.ui.Button, interaction: discord.Interaction) -> None:
-        """Handle requests to move forward one page."""
-        chapter = self.manga.chapters[self.current_chapter]
-        if self.chapter_index >= len(chapter.data) - 1:
+        """Handle requests to move forward one page (or batch of pages)."""
+        if self.chapter_index + self.step() > self.page_count() - 1:
             error = "You're already at the last page!"
             return await interaction.response.send_message(content=error, ephemeral=True)
 
-        self.chapter_index += 1
-        link = await self.get_current_page()
-        await interaction.response.edit_message(content=link)
+        self.chapter_index += self.step()
+        await self.show(interaction)
 
     @discord.ui.button(label="Last")
     async def last(self, button: discord.ui.Button, interaction: discord.Interaction) -> None:
-        """Handle requests to move forward to the last page."""
-        chapter = self.manga.chapters[self.current_chapter]
-        if self.chapter_index >= len(chapter.data) - 1:
+        """Handle requests to move forward to the last page (or batch of pages)."""
+        final = (self.page_count() - 1) // self.step() * self.step()
+        if self.chapter_index >= final:
             error = "You're already at the last page!"
             return await interaction.response.send_message(content=error, ephemeral=True)
 
-        self.chapter_index = len(chapter.data) - 1
-        link = await self.get_current_page()
-        await interaction.response.edit_message(content=link)
+        self.chapter_index = final
+        await self.show(interaction)
+
+    @discord.ui.button(label="Batch Mode")
+    async def toggle(self, button: discord.ui.Button, interaction: discord.Interaction) -> None:
+        """Handle requests to switch between showing one page and a batch of pages at a time."""
+        self.batched = not self.batched
+        button.label = "Single Page Mode" if self.batched else "Batch Mode"
+
+        # Batches always start on a multiple of the batch size.
+        self.chapter_index -= self.chapter_index % self.step()
+        await self.show(interaction)
 
     @discord.ui.button(label="Previous Chapter", row=2)
     async def last_chapter(self, button: discord.ui.Button, interaction: discord.Interaction) -> None:
         """Handle requests to move back a whole chapter."""
-        if self.current_chapter < 1:
+        if (position := self.position()) < 1:
             error = "You're already at the first chapter!"
             return await interaction.response.send_message(content=error, ephemeral=True)
 
-        self.current_chapter -= 1
-        self.chapter_index = 0
-        link = await self.get_current_page()
-        await interaction.response.edit_message(content=link)
+        self.move(position - 1)
+        await self.show(interaction)
 
     @discord.ui.button(label="Next Chapter", row=2)
     async def next_chapter(self, button: discord.ui.Button, interaction: discord.Interaction) -> None:
         """Handle requests to move to the next chapter."""
-        if self.current_chapter >= len(self.manga.chapters) - 1:
+        if (position := self.position()) >= len(self.chapters) - 1:
             error = "You're already at the last chapter!"
             return await interaction.response.send_message(content=error, ephemeral=True)
 
-        self.current_chapter = len(self.manga.chapters) - 1
-        self.chapter_index = 0
-        link = await self.get_current_page()
-        await interaction.response.edit_message(content=link)
+        # The index has one release per chapter, so this always moves to the next chapter (not another release of this one).
+        self.move(position + 1)
+        await self.show(interaction)
 
 def setup(bot: model.Bakerbot) -> None:
     cog = Mangadex(bot)
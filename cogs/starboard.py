@@ -2,15 +2,46 @@ import utilities
 import database
 import model
 
-from discord.ext import commands
-import pymongo
+from discord.ext import commands, tasks
+import dataclasses
+import collections
+import datetime
+import logging
 import discord
+import asyncio
+import pymongo
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+class BackfillFlags(commands.FlagConverter, prefix="--", delimiter=" "):
+    """Parameters accepted by `$starboard backfill`."""
+    since: str | None = None
 
 class Starboard(commands.Cog):
     """Bakerbot's implementation of a starboard."""
     def __init__(self, bot: model.Bakerbot):
+        self.states: collections.OrderedDict[int, ReactionState] = collections.OrderedDict()
+        self.capacity = 4096
+        self.delay = 1.5
+        self.backfills = set()
+        self.workers = 4
         self.bot = bot
 
+        # Database errors make the digest loop retry (with backoff) instead of stopping it for every guild.
+        self.digests.add_exception_type(pymongo.errors.PyMongoError, sqlite3.Error)
+        self.digests.start()
+
+    def cog_unload(self) -> None:
+        """Ensure batched starboard updates are written when this cog is unloaded."""
+        self.digests.cancel()
+        for state in self.states.values():
+            if state.task is not None:
+                state.task.cancel()
+
+        database.Backend.buffer.schedule()
+
     def get_emoji(self, message: discord.Message, identifier: int) -> discord.Reaction | None:
         """Return the reaction with an ID of `identifier` or None."""
         for reaction in message.reactions:
@@ -19,6 +50,27 @@ class Starboard(commands.Cog):
 
         return None
 
+    def leaderboard(self, guild: discord.Guild, config: database.GuildConfiguration, entries: list[dict]) -> str:
+        """Format a list of top starboard entries (as stored in `StarboardRollup`) into a leaderboard."""
+        emoji = self.bot.get_emoji(config.starboard_emoji_id) or "reactions"
+        lines = []
+
+        for place, entry in enumerate(entries, start=1):
+            link = f"https://discord.com/channels/{guild.id}/{entry['channel_id']}/{entry['message_id']}"
+            lines.append(f"**{place}.** {entry['reaction_count']} {emoji} by <@{entry['author_id']}> in <#{entry['channel_id']}> ([Jump!]({link}))")
+
+        return "\n".join(lines) or "No starboard messages yet."
+
+    def digest(self, guild: discord.Guild, config: database.GuildConfiguration, rollup: database.StarboardRollup, week: str) -> discord.Embed:
+        """Create a digest embed for one week of a guild's starboard."""
+        summary = rollup.weeks.get(week, {"count": 0, "top": []})
+        embed = utilities.Embeds.standard()
+        icon = guild.icon.url if guild.icon is not None else None
+        embed.set_author(name=f"Starboard digest for {guild.name}", icon_url=icon)
+        embed.set_footer(text=f"Week {week}: {summary['count']} message(s) starboarded.", icon_url=utilities.Icons.INFO)
+        embed.description = self.leaderboard(guild, config, summary["top"])
+        return embed
+
     async def cog_check(self, ctx: commands.Context) -> bool:
         """Ensure that commands are being executed in a guild context."""
         return ctx.guild is not None
@@ -39,13 +91,8 @@ class Starboard(commands.Cog):
         icon = ctx.guild.icon.url if ctx.guild.icon is not None else None
         embed.set_author(name=ctx.guild.name, icon_url=icon)
 
-        starboard = self.bot.db["starboarded_messages"]
-        document = await starboard.find_one({"guild_id": ctx.guild.id}, {"_id": False}, sort=[("_id", pymongo.DESCENDING)])
-        timestamp = "undefined"
-
-        if document is not None:
-            last = database.StarboardMessage(**document)
-            timestamp = last.timestamp.strftime("%d/%m/%Y")
+        last = await database.StarboardMessage.latest(ctx.guild.id)
+        timestamp = last.timestamp.strftime("%d/%m/%Y") if last is not None else "undefined"
 
         embed.set_footer(text=f"Last starboard message timestamp: {timestamp}", icon_url=utilities.Icons.INFO)
 
@@ -121,36 +168,403 @@ class Starboard(commands.Cog):
         await config.write()
         await ctx.reply(f"Starboard emoji set to {emoji}.")
 
-    @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
-        """Global starboard reaction handler."""
+    @starboard.command()
+    async def top(self, ctx: commands.Context) -> None:
+        """Show this guild's most-reacted starboard messages."""
+        config = await database.GuildConfiguration.ensure(ctx.guild.id)
+        rollup = await database.StarboardRollup.get(ctx.guild.id)
+
+        embed = utilities.Embeds.standard()
+        icon = ctx.guild.icon.url if ctx.guild.icon is not None else None
+        embed.set_author(name=f"Starboard leaderboard for {ctx.guild.name}", icon_url=icon)
+        embed.set_footer(text=f"{rollup.total} message(s) starboarded in total.", icon_url=utilities.Icons.INFO)
+        embed.description = self.leaderboard(ctx.guild, config, rollup.top)
+        await ctx.reply(embed=embed)
+
+    @starboard.command()
+    async def stats(self, ctx: commands.Context, member: discord.Member | None) -> None:
+        """Show starboard statistics for this guild, or for `member` if specified."""
+        rollup = await database.StarboardRollup.get(ctx.guild.id)
+        embed = utilities.Embeds.standard()
+        embed.set_footer(text=f"{rollup.total} message(s) starboarded in total.", icon_url=utilities.Icons.INFO)
+
+        if member is not None:
+            count = rollup.authors.get(str(member.id), 0)
+            rank = 1 + sum(1 for c in rollup.authors.values() if c > count)
+            share = 100 * count / rollup.total if rollup.total > 0 else 0
+
+            embed.set_author(name=member.display_name, icon_url=member.display_avatar.url)
+            embed.description = (f" • Starboarded messages: {count}\n"
+                                 f" • Share of this guild's starboard: {share:.1f}%\n"
+                                 f" • Rank: #{rank}" if count > 0 else f"{member.mention} hasn't been starboarded yet.")
+
+            return await ctx.reply(embed=embed)
+
+        icon = ctx.guild.icon.url if ctx.guild.icon is not None else None
+        embed.set_author(name=ctx.guild.name, icon_url=icon)
+        authors = sorted(rollup.authors.items(), key=lambda i: i[1], reverse=True)[:5]
+        channels = sorted(rollup.channels.items(), key=lambda i: i[1], reverse=True)[:5]
+        embed.add_field(name="Top authors", value="\n".join(f"<@{a}>: {c}" for a, c in authors) or "None yet.")
+        embed.add_field(name="Top channels", value="\n".join(f"<#{ch}>: {c}" for ch, c in channels) or "None yet.")
+        await ctx.reply(embed=embed)
+
+    @starboard.command(name="digest")
+    async def weekly(self, ctx: commands.Context) -> None:
+        """Show this week's starboard digest so far."""
+        config = await database.GuildConfiguration.ensure(ctx.guild.id)
+        rollup = await database.StarboardRollup.get(ctx.guild.id)
+        week = database.StarboardRollup.week(discord.utils.utcnow())
+        embed = self.digest(ctx.guild, config, rollup, week)
+        await ctx.reply(embed=embed)
+
+    @starboard.command()
+    @commands.has_permissions(manage_guild=True)
+    async def rebuild(self, ctx: commands.Context) -> None:
+        """Recompute this guild's starboard statistics from scratch."""
+        async with ctx.typing():
+            rollup = await database.StarboardRollup.rebuild(ctx.guild.id)
+
+        embed = utilities.Embeds.status(True)
+        embed.description = f"Starboard statistics rebuilt from {rollup.total} message(s)."
+        await ctx.reply(embed=embed)
+
+    @starboard.command()
+    @commands.has_permissions(manage_guild=True)
+    async def backfill(self, ctx: commands.Context, channels: commands.Greedy[discord.TextChannel], *, flags: BackfillFlags) -> None:
+        """Seed the starboard from channel history (all channels if none are given, `--since YYYY-MM-DD` to limit)."""
+        config = await database.GuildConfiguration.ensure(ctx.guild.id)
+        if not config.starboard_ready():
+            return await ctx.reply("Please set up and enable the starboard before backfilling it.")
+
+        if ctx.guild.id in self.backfills:
+            return await ctx.reply("A backfill is already running in this guild.")
+
+        since = None
+        if flags.since is not None:
+            try:
+                since = datetime.datetime.strptime(flags.since, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+            except ValueError:
+                return await ctx.reply(f"`{flags.since}` is not a valid date, please use the YYYY-MM-DD format.")
+
+        targets = channels or ctx.guild.text_channels
+        targets = [c for c in targets if c.id != config.starboard_channel_id and c.permissions_for(ctx.guild.me).read_message_history]
+
+        progress = BackfillProgress(channels=len(targets))
+        message = await ctx.reply(embed=progress.embed(ctx.guild))
+        self.backfills.add(ctx.guild.id)
+
+        queue = asyncio.Queue()
+        for channel in targets:
+            queue.put_nowait(channel)
+
+        async def worker() -> None:
+            while not queue.empty():
+                channel = queue.get_nowait()
+
+                try:
+                    await self.backfill_channel(channel, config, since, progress)
+                except discord.Forbidden:
+                    # Access can change mid-backfill, the other channels are still worth finishing.
+                    progress.failed.append(channel.mention)
+                except discord.HTTPException:
+                    progress.errored.append(channel.mention)
+                else:
+                    progress.completed += 1
+
+        async def reporter() -> None:
+            while True:
+                await asyncio.sleep(5)
+                await message.edit(embed=progress.embed(ctx.guild))
+
+        report = self.bot.loop.create_task(reporter())
+
+        # A bounded number of channels are walked at once to stay friendly with rate limits.
+        workers = [self.bot.loop.create_task(worker()) for _ in range(min(self.workers, len(targets)))]
+
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # If a worker fails, the others are stopped before the guild is unlocked so no writes outlive the command.
+            for task in (report, *workers):
+                task.cancel()
+
+            await asyncio.gather(report, *workers, return_exceptions=True)
+            self.backfills.discard(ctx.guild.id)
+
+            # Tracked state may predate messages that were just written, but messages that are still being
+            # processed keep theirs (a fresh lock would let a reaction arriving now post the message twice).
+            idle = [i for i, state in self.states.items() if (state.task is None or state.task.done()) and not state.lock.locked()]
+            for identifier in idle:
+                del self.states[identifier]
+
+        progress.finished = True
+        await message.edit(embed=progress.embed(ctx.guild))
+
+    async def backfill_channel(self, channel: discord.TextChannel, config: database.GuildConfiguration, since: datetime.datetime | None, progress: "BackfillProgress") -> None:
+        """Stream a channel's history (resuming from its checkpoint) and write qualifying messages in bulk."""
+        after = discord.utils.time_snowflake(since) if since is not None else 0
+        if (checkpoint := await database.StarboardCheckpoint.get(channel.id)) is not None:
+            after = max(after, checkpoint.message_id)
+
+        checkpoint = database.StarboardCheckpoint(channel_id=channel.id, guild_id=channel.guild.id, message_id=after)
+        pending = []
+        scanned = 0
+
+        async def flush() -> None:
+            if pending:
+                await database.StarboardMessage.write_many(pending)
+                progress.stored += len(pending)
+                pending.clear()
+
+            # Only move the checkpoint forward once everything before it has been written.
+            await checkpoint.write()
+
+        # History is paged in from Discord as it's iterated, so whole channels are never held in memory.
+        async for message in channel.history(limit=None, after=discord.Object(after), oldest_first=True):
+            reaction = self.get_emoji(message, config.starboard_emoji_id)
+            checkpoint.message_id = message.id
+            progress.scanned += 1
+            scanned += 1
+
+            if reaction is not None and reaction.count >= config.starboard_threshold:
+                sbmsg = await database.StarboardMessage.new(message, reaction.count)
+                pending.append(sbmsg)
+
+            if len(pending) >= 100 or scanned % 1000 == 0:
+                await flush()
+
+        await flush()
+
+    def state(self, identifier: int) -> "ReactionState":
+        """Return the tracked state for a message, evicting the least recently used message if necessary."""
+        if (state := self.states.get(identifier, None)) is not None:
+            self.states.move_to_end(identifier)
+            return state
+
+        state = ReactionState()
+        self.states[identifier] = state
+
+        if len(self.states) > self.capacity:
+            self.states.popitem(last=False)
+
+        return state
+
+    async def relevant(self, payload: discord.RawReactionActionEvent) -> bool:
+        """Check whether a reaction event could affect the starboard."""
         if payload.guild_id is None:
-            return
+            return False
 
         config = await database.GuildConfiguration.get(payload.guild_id)
         no_configuration = config is None or not config.starboard_ready()
         if no_configuration or payload.channel_id == config.starboard_channel_id:
-            return
+            return False
+
+        return payload.emoji.id == config.starboard_emoji_id
+
+    async def fetch(self, channel_id: int, message_id: int) -> discord.Message | None:
+        """Fetch a message, returning `None` if it's been deleted or the bot can no longer see it."""
+        if (channel := self.bot.get_channel(channel_id)) is None:
+            return None
+
+        try:
+            return await channel.fetch_message(message_id)
+        except (discord.NotFound, discord.Forbidden):
+            return None
+
+    def schedule(self, payload: discord.RawReactionActionEvent, state: "ReactionState") -> None:
+        """Schedule processing of a message, unless it's already scheduled (coalescing bursts of reactions)."""
+        if state.task is None:
+            coro = self.process(payload.guild_id, payload.channel_id, payload.message_id, state)
+            state.task = self.bot.loop.create_task(coro)
+
+    async def process(self, guild_id: int, channel_id: int, message_id: int, state: "ReactionState") -> None:
+        """Update the starboard for a message once its burst of reactions has settled."""
+        await asyncio.sleep(self.delay)
+
+        # Processing is serialised per message, so concurrent reactions can't double-post.
+        async with state.lock:
+            state.task = None
+            config = await database.GuildConfiguration.get(guild_id)
+            if config is None or not config.starboard_ready():
+                return
+
+            if state.count is None:
+                # Seed the counter from a single fetch, raw events keep it updated afterwards.
+                # Events that arrive while the fetch is in flight are queued and applied once it completes.
+                state.fetching = True
+                state.pending = 0
+
+                try:
+                    state.message = await self.fetch(channel_id, message_id)
+                finally:
+                    state.fetching = False
+
+                if state.message is None:
+                    self.states.pop(message_id, None)
+                    return
+
+                reaction = self.get_emoji(state.message, config.starboard_emoji_id)
+                state.count = max((reaction.count if reaction is not None else 0) + state.pending, 0)
+
+            if not state.loaded:
+                state.record = await database.StarboardMessage.get(message_id)
+                state.loaded = True
+
+            if state.record is not None:
+                # If the message is already in the database, update it and don't send a new message.
+                # Only the reaction count changes, so the write is batched with others.
+                if state.record.reaction_count != state.count:
+                    await state.record.update(reaction_count=state.count)
 
-        channel = self.bot.get_channel(payload.channel_id)
-        message = await channel.fetch_message(payload.message_id)
-        reaction = self.get_emoji(message, config.starboard_emoji_id)
+            elif state.count >= config.starboard_threshold:
+                # Otherwise, send a message to the starboard channel and write it to the database.
+                if state.message is None:
+                    if (message := await self.fetch(channel_id, message_id)) is None:
+                        self.states.pop(message_id, None)
+                        return
 
-        if reaction is not None and reaction.count >= config.starboard_threshold:
-            cache = await database.StarboardMessage.get(payload.message_id)
+                    state.message = message
 
-            if cache is not None:
-                # If the message is already in the database, update it and don't send a new message.
-                cache.reaction_count = reaction.count
-            else:
-                # Otherwise, send a message to the starboard channel.
-                embed = utilities.Embeds.package(message)
+                embed = utilities.Embeds.package(state.message)
                 starboard = self.bot.get_channel(config.starboard_channel_id)
                 await starboard.send(embed=embed)
 
-            # Write either the updated version or new StarboardMessage instance to the database.
-            sbmsg = cache or (await database.StarboardMessage.new(message, reaction.count))
-            await sbmsg.write()
+                state.record = await database.StarboardMessage.new(state.message, state.count)
+                await state.record.write()
+
+            # The message object is only needed until it has been starboarded.
+            if state.record is not None:
+                state.message = None
+
+    @tasks.loop(hours=1)
+    async def digests(self) -> None:
+        """Post last week's starboard digest to each guild's starboard channel once the week is over."""
+        previous = discord.utils.utcnow() - datetime.timedelta(weeks=1)
+        week = database.StarboardRollup.week(previous)
+
+        for guild in self.bot.guilds:
+            try:
+                config = await database.GuildConfiguration.get(guild.id)
+                if config is None or not config.starboard_ready():
+                    continue
+
+                rollup = await database.StarboardRollup.get(guild.id)
+            except database.DatabaseNotConnected:
+                return
+
+            if rollup.digested != week and rollup.weeks.get(week, {"count": 0})["count"] > 0:
+                # The incrementally maintained rankings are approximate, so the digest is made from an exact one.
+                rollup = await database.StarboardRollup.rebuild(guild.id)
+
+                if (channel := self.bot.get_channel(config.starboard_channel_id)) is not None:
+                    embed = self.digest(guild, config, rollup, week)
+
+                    try:
+                        await channel.send(embed=embed)
+                    except discord.Forbidden:
+                        # Retrying won't help until the permissions change, so this week's digest is skipped.
+                        logger.warning("Missing access to post the starboard digest in guild %s.", guild.id)
+                    except discord.HTTPException as error:
+                        # The other guilds should still get theirs, this one is retried next hour.
+                        logger.warning("Failed to post the starboard digest in guild %s.", guild.id, exc_info=error)
+                        continue
+
+                rollup.digested = week
+                await rollup.write()
+
+    @digests.before_loop
+    async def before_digests(self) -> None:
+        """Wait until the bot is ready before posting digests."""
+        await self.bot.wait_until_ready()
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
+        """Global starboard reaction handler."""
+        if await self.relevant(payload):
+            state = self.state(payload.message_id)
+            if state.count is not None:
+                state.count += 1
+            elif state.fetching:
+                state.pending += 1
+
+            self.schedule(payload, state)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent) -> None:
+        """Keep reaction counters up to date when reactions are removed."""
+        if await self.relevant(payload):
+            state = self.state(payload.message_id)
+            if state.count is not None:
+                state.count = max(state.count - 1, 0)
+            elif state.fetching:
+                state.pending -= 1
+
+            self.schedule(payload, state)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear(self, payload: discord.RawReactionClearEvent) -> None:
+        """Forget reaction counters when all reactions are removed from a message."""
+        if (state := self.states.get(payload.message_id, None)) is not None:
+            state.count = None
+            state.pending = 0
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear_emoji(self, payload: discord.RawReactionClearEmojiEvent) -> None:
+        """Forget reaction counters when an emoji is removed from a message."""
+        if (state := self.states.get(payload.message_id, None)) is not None:
+            state.count = None
+            state.pending = 0
+
+@dataclasses.dataclass
+class BackfillProgress:
+    """Progress of a starboard backfill."""
+    channels: int
+    completed: int = 0
+    scanned: int = 0
+    stored: int = 0
+    failed: list[str] = dataclasses.field(default_factory=list)
+    errored: list[str] = dataclasses.field(default_factory=list)
+    finished: bool = False
+    start: float = dataclasses.field(default_factory=time.perf_counter)
+
+    def embed(self, guild: discord.Guild) -> discord.Embed:
+        """Return an embed describing this backfill's progress and throughput."""
+        elapsed = time.perf_counter() - self.start
+        throughput = self.scanned / elapsed if elapsed > 0 else 0
+
+        embed = utilities.Embeds.status(True) if self.finished else utilities.Embeds.standard()
+        icon = guild.icon.url if guild.icon is not None else None
+        embed.set_author(name=f"Starboard backfill for {guild.name}", icon_url=icon)
+
+        embed.description = (f" • Channels completed: {self.completed}/{self.channels}\n"
+                             f" • Messages scanned: {self.scanned}\n"
+                             f" • Messages starboarded: {self.stored}\n"
+                             f" • Throughput: {throughput:.1f} messages/s over {elapsed:.0f}s")
+
+        if self.failed:
+            skipped = utilities.Limits.limit(", ".join(self.failed), utilities.Limits.EMBED_FIELD_VALUE)
+            embed.add_field(name="Channels skipped (missing access)", value=skipped)
+
+        if self.errored:
+            skipped = utilities.Limits.limit(", ".join(self.errored), utilities.Limits.EMBED_FIELD_VALUE)
+            embed.add_field(name="Channels skipped (Discord errors)", value=skipped)
+
+        if not self.finished:
+            embed.set_footer(text="Backfill in progress, this message updates every few seconds.", icon_url=utilities.Icons.INFO)
+
+        return embed
+
+@dataclasses.dataclass
+class ReactionState:
+    """Reaction state tracked by the starboard for a single message."""
+    count: int | None = None
+    fetching: bool = False
+    pending: int = 0
+    loaded: bool = False
+    record: database.StarboardMessage | None = None
+    message: discord.Message | None = None
+    task: asyncio.Task | None = None
+    lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock)
 
 def setup(bot: model.Bakerbot) -> None:
     cog = Starboard(bot)
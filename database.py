@@ -1,10 +1,22 @@
 import model
 
 import motor.motor_asyncio as motor
+import concurrent.futures
 import dataclasses
+import contextlib
 import datetime
+import logging
 import discord
+import sqlite3
+import asyncio
+import typing
+import pymongo
+import json
 import copy
+import time
+import abc
+
+logger = logging.getLogger(__name__)
 
 @dataclasses.dataclass
 class StarboardMessage:
@@ -22,9 +34,27 @@ class StarboardMessage:
     @classmethod
     async def get(cls, identifier: int) -> "StarboardMessage | None":
         """Get the StarboardMessage instance for a message from the database. Returns `None` if the message is not in the database."""
-        collection = Backend.db["starboarded_messages"]
-        query = {"message_id": identifier}
-        document = await collection.find_one(query, {"_id": False})
+        document = await Backend.engine.find("starboarded_messages", "message_id", identifier)
+
+        if document is None:
+            return None
+
+        # Apply any updates that haven't been flushed to the database yet.
+        document.update(Backend.buffer.pending.get(identifier, {}))
+        return cls(**document)
+
+    async def update(self, **fields: typing.Any) -> None:
+        """Update fields of this (already written) StarboardMessage, batching the write with others (see `WriteBuffer`)."""
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+        Backend.buffer.update(self.message_id, fields)
+        await StarboardRollup.record([self], set(), deferred=True)
+
+    @classmethod
+    async def latest(cls, identifier: int) -> "StarboardMessage | None":
+        """Get the most recently starboarded message for a guild. Returns `None` if the guild has no starboarded messages."""
+        document = await Backend.engine.latest("starboarded_messages", "guild_id", identifier)
 
         if document is None:
             return None
@@ -51,10 +81,206 @@ class StarboardMessage:
 
     async def write(self) -> None:
         """Write this StarboardMessage instance to the database."""
-        starboard = Backend.db["starboarded_messages"]
-        query = {"message_id": self.message_id}
         document = dataclasses.asdict(self)
-        await starboard.replace_one(query, document, upsert=True)
+        Backend.buffer.discard(self.message_id)
+        inserted = await Backend.engine.replace("starboarded_messages", "message_id", document)
+        await StarboardRollup.record([self], {self.message_id} if inserted else set())
+
+    @staticmethod
+    async def write_many(messages: list["StarboardMessage"]) -> None:
+        """Write several StarboardMessage instances to the database in bulk."""
+        for message in messages:
+            Backend.buffer.discard(message.message_id)
+
+        documents = [dataclasses.asdict(message) for message in messages]
+        inserted = await Backend.engine.replace_many("starboarded_messages", "message_id", documents)
+        await StarboardRollup.record(messages, set(inserted))
+
+@dataclasses.dataclass
+class StarboardRollup:
+    """The database starboard statistics template, maintained incrementally as starboard messages are written."""
+    guild_id: int
+    total: int
+    authors: dict[str, int]
+    channels: dict[str, int]
+    top: list[dict]
+    weeks: dict[str, dict]
+    digested: str | None
+
+    size: typing.ClassVar[int] = 10
+    history: typing.ClassVar[int] = 8
+    lifetime: typing.ClassVar[float] = 60
+    cache: typing.ClassVar[dict[int, tuple["StarboardRollup", float]]] = {}
+    locks: typing.ClassVar[dict[int, asyncio.Lock]] = {}
+    dirty: typing.ClassVar[set[int]] = set()
+
+    @classmethod
+    def new(cls, identifier: int) -> "StarboardRollup":
+        """Create a new (empty) instance of `StarboardRollup` for a guild with ID `identifier`."""
+        return cls(guild_id=identifier, total=0, authors={}, channels={}, top=[], weeks={}, digested=None)
+
+    @classmethod
+    async def get(cls, identifier: int) -> "StarboardRollup":
+        """Get the StarboardRollup instance for a guild, creating an empty one if the guild has none."""
+        if (cached := cls.cache.get(identifier, None)) is not None:
+            rollup, loaded = cached
+
+            # Other processes may have written the rollup, so cached copies are only trusted for a while.
+            # Copies with unwritten changes (or that are being changed right now) are always kept.
+            lock = cls.locks.get(identifier, None)
+            if time.monotonic() - loaded < cls.lifetime or identifier in cls.dirty or (lock is not None and lock.locked()):
+                return rollup
+
+        document = await Backend.engine.find("starboard_rollups", "guild_id", identifier)
+        rollup = cls(**document) if document is not None else cls.new(identifier)
+        cls.store(rollup)
+        return rollup
+
+    @classmethod
+    def store(cls, rollup: "StarboardRollup") -> None:
+        """Cache a guild's rollup."""
+        cls.cache[rollup.guild_id] = (rollup, time.monotonic())
+
+    @classmethod
+    def cutoff(cls, now: datetime.datetime) -> datetime.datetime:
+        """Return the start of the oldest ISO week that's kept for digests (so exactly `history` weeks, including this one)."""
+        today = now.astimezone(datetime.timezone.utc).date()
+        monday = today - datetime.timedelta(days=today.isoweekday() - 1)
+        start = datetime.datetime.combine(monday, datetime.time(), datetime.timezone.utc)
+        return start - datetime.timedelta(weeks=cls.history - 1)
+
+    @staticmethod
+    def week(timestamp: datetime.datetime) -> str:
+        """Return the ISO week that `timestamp` falls in (e.g. `2022-W07`)."""
+        year, week, _ = timestamp.isocalendar()
+        return f"{year}-W{week:02}"
+
+    @classmethod
+    def rank(cls, top: list[dict], message: StarboardMessage) -> bool:
+        """Update a top-N list with `message`'s reaction count. Returns whether the list changed.
+
+        The list is approximate: a message whose count drops stays ranked above ones that aren't in the list anymore,
+        so anything that needs an exact ranking (like digests) should use `StarboardRollup.rebuild()` first."""
+        entry = {
+            "message_id": message.message_id,
+            "author_id": message.author_id,
+            "channel_id": message.channel_id,
+            "reaction_count": message.reaction_count
+        }
+
+        if entry in top:
+            return False
+
+        ranked = [e for e in top if e["message_id"] != message.message_id]
+        ranked.append(entry)
+        ranked.sort(key=lambda e: e["reaction_count"], reverse=True)
+        ranked = ranked[:cls.size]
+
+        changed = ranked != top
+        top[:] = ranked
+        return changed
+
+    def apply(self, message: StarboardMessage, inserted: bool) -> bool:
+        """Fold a written starboard message into this rollup. Returns whether the rollup changed."""
+        key = self.week(message.timestamp)
+        week = self.weeks.setdefault(key, {"count": 0, "top": []})
+        changed = False
+
+        if inserted:
+            author, channel = str(message.author_id), str(message.channel_id)
+            self.authors[author] = self.authors.get(author, 0) + 1
+            self.channels[channel] = self.channels.get(channel, 0) + 1
+            self.total += 1
+            week["count"] += 1
+            changed = True
+
+        changed |= self.rank(self.top, message)
+        changed |= self.rank(week["top"], message)
+
+        # Only the most recent weeks are kept around for digests.
+        oldest = self.week(self.cutoff(datetime.datetime.now(datetime.timezone.utc)))
+        for stale in [k for k in self.weeks if k < oldest]:
+            del self.weeks[stale]
+
+        return changed
+
+    @classmethod
+    async def record(cls, messages: list[StarboardMessage], inserted: set[int], deferred: bool=False) -> None:
+        """Update the rollups for written starboard messages (`inserted` holds the IDs of newly inserted ones).
+
+        With `deferred`, changed rollups are written by the next `WriteBuffer` flush instead of straight away."""
+        guilds = {}
+        for message in messages:
+            guilds.setdefault(message.guild_id, []).append(message)
+
+        for identifier, members in guilds.items():
+            async with cls.locks.setdefault(identifier, asyncio.Lock()):
+                rollup = await cls.get(identifier)
+                changed = [rollup.apply(m, m.message_id in inserted) for m in members]
+
+                if any(changed) and deferred:
+                    cls.dirty.add(identifier)
+                elif any(changed):
+                    await rollup.write()
+
+    @classmethod
+    async def flush(cls) -> None:
+        """Write every rollup with deferred changes to the database as a single bulk operation."""
+        if not cls.dirty:
+            return
+
+        identifiers, cls.dirty = cls.dirty, set()
+        documents = [dataclasses.asdict(cls.cache[i][0]) for i in identifiers if i in cls.cache]
+
+        try:
+            await Backend.engine.replace_many("starboard_rollups", "guild_id", documents)
+        except Exception:
+            cls.dirty |= identifiers
+            raise
+
+    @classmethod
+    async def rebuild(cls, identifier: int) -> "StarboardRollup":
+        """Recompute a guild's rollup from scratch using every starboard message in the database."""
+        cutoff = cls.cutoff(datetime.datetime.now(datetime.timezone.utc))
+        statistics = await Backend.engine.rollup(identifier, cls.size, cutoff)
+        rollup = dataclasses.replace(cls.new(identifier), **statistics)
+
+        async with cls.locks.setdefault(identifier, asyncio.Lock()):
+            if (cached := cls.cache.get(identifier, None)) is not None:
+                rollup.digested = cached[0].digested
+
+            cls.store(rollup)
+            cls.dirty.discard(identifier)
+            await rollup.write()
+
+        return rollup
+
+    async def write(self) -> None:
+        """Write this StarboardRollup instance to the database."""
+        document = dataclasses.asdict(self)
+        await Backend.engine.replace("starboard_rollups", "guild_id", document)
+
+@dataclasses.dataclass
+class StarboardCheckpoint:
+    """The database starboard backfill checkpoint template (the last message scanned in a channel)."""
+    channel_id: int
+    guild_id: int
+    message_id: int
+
+    @classmethod
+    async def get(cls, identifier: int) -> "StarboardCheckpoint | None":
+        """Get the StarboardCheckpoint instance for a channel from the database. Returns `None` if the channel has no checkpoint."""
+        document = await Backend.engine.find("starboard_checkpoints", "channel_id", identifier)
+
+        if document is None:
+            return None
+
+        return cls(**document)
+
+    async def write(self) -> None:
+        """Write this StarboardCheckpoint instance to the database."""
+        document = dataclasses.asdict(self)
+        await Backend.engine.replace("starboard_checkpoints", "channel_id", document)
 
 @dataclasses.dataclass
 class GuildConfiguration:
@@ -95,14 +321,15 @@ class GuildConfiguration:
         )
 
     @classmethod
-    async def get(cls, identifier: int) -> "GuildConfiguration | None":
-        """Get the GuildConfiguration instance for a guild from the database. Returns `None` if the guild is not in the database."""
-        collection = Backend.db["guild_settings"]
-        query = {"guild_id": identifier}
-        document = await collection.find_one(query, {"_id": False})
-
-        if document is None:
-            return None
+    def load(cls, document: dict) -> "GuildConfiguration":
+        """Create a GuildConfiguration instance from a database document, patching in any missing fields."""
+        if Backend.schema_current:
+            # Every document has been backfilled by `Backend.migrate()`, so patching can be skipped.
+            try:
+                return cls(**document)
+            except TypeError:
+                # Probably written by an out-of-date process, patch it below.
+                pass
 
         # Find the set of fields that are defined in the dataclass but not present in the document.
         fields = set((field.name for field in dataclasses.fields(cls)))
@@ -118,37 +345,849 @@ class GuildConfiguration:
 
         return cls(**document)
 
+    @classmethod
+    async def get(cls, identifier: int) -> "GuildConfiguration | None":
+        """Get the GuildConfiguration instance for a guild (from the cache if possible). Returns `None` if the guild is not in the database."""
+        if GuildCache.contains(identifier):
+            return GuildCache.fetch(identifier)
+
+        document = await Backend.engine.find("guild_settings", "guild_id", identifier)
+        config = cls.load(document) if document is not None else None
+
+        # Negative results are cached too, so unconfigured guilds don't hit the database either.
+        GuildCache.store(identifier, config)
+        return config
+
     async def write(self) -> None:
         """Write the guild's configuration to the database."""
-        collection = Backend.db["guild_settings"]
-        query = {"guild_id": self.guild_id}
         document = dataclasses.asdict(self)
-        await collection.replace_one(query, document, upsert=True)
+        await Backend.engine.replace("guild_settings", "guild_id", document)
+        GuildCache.store(self.guild_id, self)
 
     def starboard_ready(self) -> bool:
         """Check whether this guild has its starboard configuration set."""
         members = (self.starboard_channel_id, self.starboard_emoji_id)
         return self.starboard_enabled == True and None not in members
 
+@dataclasses.dataclass
+class MangaFollow:
+    """The database manga follow template (a channel that is sent new chapters of a manga)."""
+    follow_id: str
+    channel_id: int
+    guild_id: int | None
+    manga_id: str
+    title: str
+
+    @staticmethod
+    def key(channel_id: int, manga_id: str) -> str:
+        """Return the ID of the follow between a channel and a manga."""
+        return f"{channel_id}:{manga_id}"
+
+    @classmethod
+    def new(cls, channel: discord.abc.Messageable, manga_id: str, title: str) -> "MangaFollow":
+        """Create a new instance of `MangaFollow` for a channel following a manga."""
+        guild = getattr(channel, "guild", None)
+
+        return cls(
+            follow_id=cls.key(channel.id, manga_id),
+            channel_id=channel.id,
+            guild_id=guild.id if guild is not None else None,
+            manga_id=manga_id,
+            title=title
+        )
+
+    @classmethod
+    async def get(cls, channel_id: int, manga_id: str) -> "MangaFollow | None":
+        """Get the MangaFollow instance between a channel and a manga. Returns `None` if the channel doesn't follow it."""
+        document = await Backend.engine.find("manga_follows", "follow_id", cls.key(channel_id, manga_id))
+
+        if document is None:
+            return None
+
+        return cls(**document)
+
+    @classmethod
+    async def channel(cls, identifier: int) -> list["MangaFollow"]:
+        """Return every manga followed by a channel."""
+        return [cls(**document) async for document in Backend.engine.scan("manga_follows", "channel_id", identifier)]
+
+    @classmethod
+    async def following(cls, identifiers: list[str]) -> list["MangaFollow"]:
+        """Return every follow of the manga in `identifiers` (in a single query)."""
+        documents = await Backend.engine.find_many("manga_follows", "manga_id", identifiers)
+        return [cls(**document) for document in documents]
+
+    async def write(self) -> None:
+        """Write this MangaFollow instance to the database."""
+        document = dataclasses.asdict(self)
+        await Backend.engine.replace("manga_follows", "follow_id", document)
+
+    async def delete(self) -> None:
+        """Remove this MangaFollow instance from the database."""
+        await Backend.engine.delete("manga_follows", "follow_id", self.follow_id)
+
+@dataclasses.dataclass
+class MangaSeries:
+    """The database followed manga template, holding a series' watermark and polling schedule."""
+    manga_id: str
+    title: str
+    watermark: str
+    interval: float
+    due: float
+    released: float | None
+    cadence: float | None
+
+    minimum: typing.ClassVar[float] = 900
+    maximum: typing.ClassVar[float] = 86400
+
+    @staticmethod
+    def timestamp(seconds: float) -> str:
+        """Return a UNIX timestamp in the format that Mangadex expects for `updatedAtSince` (UTC, without an offset)."""
+        moment = datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+        return moment.strftime("%Y-%m-%dT%H:%M:%S")
+
+    @classmethod
+    def new(cls, manga_id: str, title: str, now: float) -> "MangaSeries":
+        """Create a new instance of `MangaSeries` that only picks up chapters released after `now`."""
+        return cls(
+            manga_id=manga_id,
+            title=title,
+            watermark=cls.timestamp(now),
+            interval=cls.minimum,
+            due=now + cls.minimum,
+            released=None,
+            cadence=None
+        )
+
+    @classmethod
+    async def get(cls, identifier: str) -> "MangaSeries | None":
+        """Get the MangaSeries instance for a manga. Returns `None` if nobody follows it."""
+        document = await Backend.engine.find("manga_series", "manga_id", identifier)
+
+        if document is None:
+            return None
+
+        return cls(**document)
+
+    @classmethod
+    async def all(cls) -> list["MangaSeries"]:
+        """Return every followed manga."""
+        return [cls(**document) async for document in Backend.engine.all("manga_series")]
+
+    def schedule(self, now: float, released: bool) -> None:
+        """Work out when this series should next be polled, based on how often it has released chapters so far."""
+        if released:
+            # The cadence is a moving average of the gaps between releases.
+            if self.released is not None:
+                gap = now - self.released
+                self.cadence = gap if self.cadence is None else 0.7 * self.cadence + 0.3 * gap
+
+            self.released = now
+
+        if self.cadence is not None and now - self.released < 2 * self.cadence:
+            # Check a few times per expected release.
+            self.interval = self.cadence / 8
+        elif released:
+            # Only one release has been seen, so there's no cadence to go on yet.
+            self.interval = self.minimum
+        else:
+            # The cadence is unknown or the series has gone quiet, so back off.
+            self.interval *= 1.5
+
+        self.interval = min(max(self.interval, self.minimum), self.maximum)
+        self.due = now + self.interval
+
+    async def write(self) -> None:
+        """Write this MangaSeries instance to the database."""
+        document = dataclasses.asdict(self)
+        await Backend.engine.replace("manga_series", "manga_id", document)
+
+    @staticmethod
+    async def write_many(series: list["MangaSeries"]) -> None:
+        """Write several MangaSeries instances to the database in bulk."""
+        documents = [dataclasses.asdict(s) for s in series]
+        await Backend.engine.replace_many("manga_series", "manga_id", documents)
+
+    async def delete(self) -> None:
+        """Remove this MangaSeries instance from the database."""
+        await Backend.engine.delete("manga_series", "manga_id", self.manga_id)
+
+class GuildCache:
+    """A process-wide, write-through cache of guild configurations (one entry per guild)."""
+    entries: dict[int, GuildConfiguration | None] = {}
+    stamps: dict[int, int] = {}
+    sequence = 0
+    interval = 60
+    task: asyncio.Task | None = None
+
+    @classmethod
+    def contains(cls, identifier: int) -> bool:
+        """Check whether a guild has an entry (positive or negative) in the cache."""
+        return identifier in cls.entries
+
+    @classmethod
+    def fetch(cls, identifier: int) -> GuildConfiguration | None:
+        """Return a copy of a guild's cached configuration so callers can't mutate the cache."""
+        return copy.deepcopy(cls.entries[identifier])
+
+    @classmethod
+    def store(cls, identifier: int, config: GuildConfiguration | None) -> None:
+        """Store a guild's configuration (or `None` if it has no configuration) in the cache."""
+        cls.sequence += 1
+        cls.stamps[identifier] = cls.sequence
+        cls.entries[identifier] = copy.deepcopy(config)
+
+    @classmethod
+    async def refresh(cls, identifiers: list[int], overwrite: bool) -> None:
+        """Load the configurations for `identifiers` using a single query."""
+        mark = cls.sequence
+        found = await Backend.engine.find_many("guild_settings", "guild_id", identifiers)
+        documents = {d["guild_id"]: d for d in found}
+
+        for identifier in identifiers:
+            # Skip entries that were written while the query was in flight, they're newer.
+            if cls.stamps.get(identifier, 0) > mark or (not overwrite and identifier in cls.entries):
+                continue
+
+            document = documents.get(identifier, None)
+            config = GuildConfiguration.load(document) if document is not None else None
+            cls.entries[identifier] = config
+
+    @classmethod
+    async def watch(cls) -> None:
+        """Keep the cache coherent with writes made by other processes."""
+        async for document in Backend.engine.changes("guild_settings"):
+            if document is not None:
+                config = GuildConfiguration.load(document)
+                cls.store(config.guild_id, config)
+            else:
+                # The engine couldn't tell us what changed, so reload everything.
+                await cls.refresh(list(cls.entries.keys()), overwrite=True)
+
+    @classmethod
+    async def poll(cls) -> None:
+        """Keep the cache coherent by periodically reloading every entry (used without change notifications)."""
+        while True:
+            await asyncio.sleep(cls.interval)
+
+            try:
+                await cls.refresh(list(cls.entries.keys()), overwrite=True)
+            except (pymongo.errors.PyMongoError, sqlite3.Error):
+                # Try again next interval.
+                pass
+
+    @classmethod
+    async def run(cls, bot: model.Bakerbot) -> None:
+        """Preload the cache with every joined guild, then keep it coherent."""
+        await bot.wait_until_ready()
+        await cls.refresh([guild.id for guild in bot.guilds], overwrite=False)
+
+        try:
+            await cls.watch()
+        except ChangesUnavailable:
+            await cls.poll()
+
+class Schema:
+    """Describes the database layout: each collection's key field and any other queried fields."""
+    version = 1
+
+    collections = {
+        "metadata": ("name", []),
+        "guild_settings": ("guild_id", []),
+        "starboarded_messages": ("message_id", ["guild_id"]),
+        "starboard_checkpoints": ("channel_id", []),
+        "starboard_rollups": ("guild_id", []),
+        "manga_follows": ("follow_id", ["channel_id", "manga_id"]),
+        "manga_series": ("manga_id", [])
+    }
+
+    @staticmethod
+    def defaults() -> dict[str, dict]:
+        """Return the default values of fields that may be missing from older documents, by collection."""
+        template = dataclasses.asdict(GuildConfiguration.new(0))
+        del template["guild_id"]
+        return {"guild_settings": template}
+
+class WriteBuffer:
+    """Merges updates to documents in a collection and writes them behind in bulk."""
+    def __init__(self, collection: str, key: str, interval: float=2, threshold: int=100, after: typing.Callable[[], typing.Awaitable[None]] | None=None) -> None:
+        self.collection = collection
+        self.key = key
+        self.after = after
+        self.interval = interval
+        self.threshold = threshold
+        self.pending: dict[typing.Any, dict] = {}
+        self.task: asyncio.Task | None = None
+        self.flushes: set[asyncio.Task] = set()
+
+    def update(self, value: typing.Any, fields: dict) -> None:
+        """Queue `fields` to be set on the document where `key` is `value`, merging with earlier updates."""
+        self.pending.setdefault(value, {}).update(fields)
+
+        if len(self.pending) >= self.threshold:
+            self.schedule()
+
+    def schedule(self) -> asyncio.Task:
+        """Flush in the background, keeping hold of the task until it's done (see `Backend.stop()`)."""
+        task = asyncio.create_task(self.flush())
+        self.flushes.add(task)
+        task.add_done_callback(self.flushed)
+        return task
+
+    def flushed(self, task: asyncio.Task) -> None:
+        """Forget a finished background flush, logging it if it failed (its updates are retried by the next flush)."""
+        self.flushes.discard(task)
+
+        if not task.cancelled() and (error := task.exception()) is not None:
+            logger.warning("Failed to flush buffered updates to %s.", self.collection, exc_info=error)
+
+    def discard(self, value: typing.Any) -> None:
+        """Drop any queued updates for a document (it's about to be written in full)."""
+        self.pending.pop(value, None)
+
+    async def flush(self) -> None:
+        """Write every queued update to the database as a single bulk operation, then run the `after` hook (for derived writes)."""
+        if self.pending:
+            updates, self.pending = self.pending, {}
+
+            try:
+                await Backend.engine.update_many(self.collection, self.key, updates)
+            except Exception:
+                # Put the updates back (without clobbering newer ones) so the next flush retries them.
+                for value, fields in updates.items():
+                    self.pending[value] = fields | self.pending.get(value, {})
+
+                raise
+
+        if self.after is not None:
+            await self.after()
+
+    async def run(self) -> None:
+        """Flush queued updates every `interval` seconds."""
+        while True:
+            await asyncio.sleep(self.interval)
+
+            try:
+                await self.flush()
+            except (pymongo.errors.PyMongoError, sqlite3.Error):
+                # Try again next interval.
+                pass
+
+class Engine(abc.ABC):
+    """The interface implemented by every storage engine. Documents are dictionaries that are keyed by one of their fields."""
+    @abc.abstractmethod
+    async def prepare(self) -> None:
+        """Prepare the engine for use, creating any indexes listed in `Schema` (called once at startup)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def backfill(self, collection: str, defaults: dict) -> None:
+        """Add fields from `defaults` to every document in `collection` that is missing them."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def find(self, collection: str, key: str, value: typing.Any) -> dict | None:
+        """Return the document in `collection` where `key` is `value` or `None`."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def find_many(self, collection: str, key: str, values: list[typing.Any]) -> list[dict]:
+        """Return every document in `collection` where `key` is one of `values`."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def latest(self, collection: str, key: str, value: typing.Any) -> dict | None:
+        """Return the most recently inserted document in `collection` where `key` is `value` or `None`."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def scan(self, collection: str, key: str, value: typing.Any) -> typing.AsyncIterator[dict]:
+        """Yield every document in `collection` where `key` is `value`, streaming them from the database."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def all(self, collection: str) -> typing.AsyncIterator[dict]:
+        """Yield every document in `collection`, streaming them from the database."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def replace(self, collection: str, key: str, document: dict) -> bool:
+        """Insert `document` into `collection`, replacing any document with the same `key`. Returns whether it was inserted."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def replace_many(self, collection: str, key: str, documents: list[dict]) -> list[typing.Any]:
+        """Insert `documents` into `collection` in bulk, replacing any documents with the same `key`. Returns the keys that were inserted."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def update_many(self, collection: str, key: str, updates: dict[typing.Any, dict]) -> None:
+        """Set fields on existing documents in `collection` in bulk (`updates` maps `key` values to the fields to set)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete(self, collection: str, key: str, value: typing.Any) -> bool:
+        """Remove the document in `collection` where `key` is `value`. Returns whether there was one."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def changes(self, collection: str) -> typing.AsyncIterator[dict | None]:
+        """Yield documents in `collection` as other processes change them (`None` if unknown). Raises `ChangesUnavailable` if unsupported."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def close(self) -> None:
+        """Release any resources held by the engine."""
+        raise NotImplementedError
+
+    async def rollup(self, identifier: int, size: int, cutoff: datetime.datetime) -> dict:
+        """Compute a guild's starboard statistics (the `total`, `authors`, `channels`, `top` and `weeks` of a `StarboardRollup`) from its messages."""
+        # Engines without server-side aggregation stream the documents through `StarboardRollup.apply()` instead.
+        rollup = StarboardRollup.new(identifier)
+        async for document in self.scan("starboarded_messages", "guild_id", identifier):
+            rollup.apply(StarboardMessage(**document), True)
+
+        return {"total": rollup.total, "authors": rollup.authors, "channels": rollup.channels, "top": rollup.top, "weeks": rollup.weeks}
+
+class MongoEngine(Engine):
+    """A storage engine backed by a MongoDB database."""
+    def __init__(self, database: motor.AsyncIOMotorDatabase) -> None:
+        self.database = database
+
+    async def prepare(self) -> None:
+        # Make sure that the address is valid, the client itself connects lazily.
+        await self.database.command("ping")
+
+        for name, (key, fields) in Schema.collections.items():
+            collection = self.database[name]
+
+            try:
+                await collection.create_index(key, unique=True)
+            except pymongo.errors.DuplicateKeyError:
+                # Documents written before the index existed may share a key, which has to be fixed before it can be built.
+                removed = await self.deduplicate(name, key)
+                logger.warning("Removed %d duplicate document(s) from %s before indexing %s.", removed, name, key)
+                await collection.create_index(key, unique=True)
+
+            for field in fields:
+                # Compound with `_id` so that `latest()` can walk the index backwards instead of sorting.
+                await collection.create_index([(field, pymongo.ASCENDING), ("_id", pymongo.DESCENDING)])
+
+    async def deduplicate(self, collection: str, key: str) -> int:
+        """Remove all but the most recently inserted document for every `key` shared by several documents. Returns how many were removed."""
+        pipeline = [
+            {"$group": {"_id": f"${key}", "identifiers": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+
+        redundant = []
+        async for group in self.database[collection].aggregate(pipeline, allowDiskUse=True):
+            # Object IDs start with their creation time, so the largest one is the newest document.
+            redundant.extend(sorted(group["identifiers"], reverse=True)[1:])
+
+        if not redundant:
+            return 0
+
+        result = await self.database[collection].delete_many({"_id": {"$in": redundant}})
+        return result.deleted_count
+
+    async def backfill(self, collection: str, defaults: dict) -> None:
+        operations = [pymongo.UpdateMany({f: {"$exists": False}}, {"$set": {f: v}}) for f, v in defaults.items()]
+        await self.database[collection].bulk_write(operations, ordered=False)
+
+    async def find(self, collection: str, key: str, value: typing.Any) -> dict | None:
+        return await self.database[collection].find_one({key: value}, {"_id": False})
+
+    async def find_many(self, collection: str, key: str, values: list[typing.Any]) -> list[dict]:
+        cursor = self.database[collection].find({key: {"$in": values}}, {"_id": False})
+        return [document async for document in cursor]
+
+    async def latest(self, collection: str, key: str, value: typing.Any) -> dict | None:
+        order = [("_id", pymongo.DESCENDING)]
+        return await self.database[collection].find_one({key: value}, {"_id": False}, sort=order)
+
+    async def scan(self, collection: str, key: str, value: typing.Any) -> typing.AsyncIterator[dict]:
+        async for document in self.database[collection].find({key: value}, {"_id": False}):
+            yield document
+
+    async def all(self, collection: str) -> typing.AsyncIterator[dict]:
+        async for document in self.database[collection].find({}, {"_id": False}):
+            yield document
+
+    async def aggregate(self, collection: str, pipeline: list[dict]) -> list[dict]:
+        """Run an aggregation pipeline over `collection` on the server."""
+        cursor = self.database[collection].aggregate(pipeline)
+        return [document async for document in cursor]
+
+    async def rollup(self, identifier: int, size: int, cutoff: datetime.datetime) -> dict:
+        # Let the server do the heavy lifting with a single aggregation pipeline.
+        entry = {"_id": False, "message_id": True, "author_id": True, "channel_id": True, "reaction_count": True}
+
+        pipeline = [
+            {"$match": {"guild_id": identifier}},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "authors": [{"$group": {"_id": "$author_id", "count": {"$sum": 1}}}],
+                "channels": [{"$group": {"_id": "$channel_id", "count": {"$sum": 1}}}],
+                "top": [{"$sort": {"reaction_count": -1}}, {"$limit": size}, {"$project": entry}],
+                "weeks": [
+                    {"$match": {"timestamp": {"$gte": cutoff}}},
+                    {"$sort": {"reaction_count": -1}},
+                    {"$group": {
+                        "_id": {"year": {"$isoWeekYear": "$timestamp"}, "week": {"$isoWeek": "$timestamp"}},
+                        "count": {"$sum": 1},
+                        "top": {"$push": {k: f"${k}" for k in entry if k != "_id"}}
+                    }},
+                    {"$project": {"count": True, "top": {"$slice": ["$top", size]}}}
+                ]
+            }}
+        ]
+
+        result = (await self.aggregate("starboarded_messages", pipeline))[0]
+        weeks = {f"{w['_id']['year']}-W{w['_id']['week']:02}": {"count": w["count"], "top": w["top"]} for w in result["weeks"]}
+
+        return {
+            "total": result["total"][0]["count"] if result["total"] else 0,
+            "authors": {str(d["_id"]): d["count"] for d in result["authors"]},
+            "channels": {str(d["_id"]): d["count"] for d in result["channels"]},
+            "top": result["top"],
+            "weeks": weeks
+        }
+
+    async def replace(self, collection: str, key: str, document: dict) -> bool:
+        result = await self.database[collection].replace_one({key: document[key]}, document, upsert=True)
+        return result.upserted_id is not None
+
+    async def replace_many(self, collection: str, key: str, documents: list[dict]) -> list[typing.Any]:
+        operations = [pymongo.ReplaceOne({key: d[key]}, d, upsert=True) for d in documents]
+        result = await self.database[collection].bulk_write(operations, ordered=False)
+        return [documents[index][key] for index in result.upserted_ids]
+
+    async def update_many(self, collection: str, key: str, updates: dict[typing.Any, dict]) -> None:
+        operations = [pymongo.UpdateOne({key: value}, {"$set": fields}) for value, fields in updates.items()]
+        await self.database[collection].bulk_write(operations, ordered=False)
+
+    async def delete(self, collection: str, key: str, value: typing.Any) -> bool:
+        result = await self.database[collection].delete_one({key: value})
+        return result.deleted_count > 0
+
+    async def changes(self, collection: str) -> typing.AsyncIterator[dict | None]:
+        try:
+            async with self.database[collection].watch(full_document="updateLookup") as stream:
+                async for change in stream:
+                    if (document := change.get("fullDocument", None)) is not None:
+                        document.pop("_id", None)
+
+                    # Deletions only carry the `_id` of the document, so the change is unknown.
+                    yield document
+
+        except pymongo.errors.PyMongoError as error:
+            # Change streams are only available on replica sets.
+            raise ChangesUnavailable from error
+
+    async def close(self) -> None:
+        # The client is owned by the bot and outlives the engine.
+        pass
+
+class SQLiteEngine(Engine):
+    """A storage engine backed by an embedded SQLite database, suitable for single-node deployments."""
+    def __init__(self, path: str, interval: float=5) -> None:
+        self.path = path
+        self.interval = interval
+
+        # Writes are serialised onto a single thread with its own connection.
+        # WAL mode lets reads on the event loop's connection proceed alongside them.
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.readers = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.writer = self.connect()
+        self.reader = self.connect()
+
+        for name, (key, fields) in Schema.collections.items():
+            self.writer.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (key PRIMARY KEY, document TEXT NOT NULL)')
+
+            for field in fields:
+                expression = self.expression(name, field)
+                self.writer.execute(f'CREATE INDEX IF NOT EXISTS "{name}_{field}" ON "{name}" ({expression})')
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a new connection to the database file."""
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def expression(self, collection: str, key: str) -> str:
+        """Return the SQL expression that selects `key` from documents in `collection`."""
+        if Schema.collections[collection][0] == key:
+            return "key"
+
+        # Field names are inlined (never user input) so expression indexes can be used.
+        return f"json_extract(document, '$.{key}')"
+
+    def encode(self, document: dict) -> str:
+        """Serialise a document into JSON, preserving datetimes."""
+        def default(obj: typing.Any) -> typing.Any:
+            if isinstance(obj, datetime.datetime):
+                return {"$date": obj.isoformat()}
+
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serialisable.")
+
+        return json.dumps(document, default=default)
+
+    def decode(self, data: str) -> dict:
+        """Deserialise a document from JSON, restoring datetimes."""
+        def hook(obj: dict) -> typing.Any:
+            if len(obj) == 1 and "$date" in obj:
+                return datetime.datetime.fromisoformat(obj["$date"])
+
+            return obj
+
+        return json.loads(data, object_hook=hook)
+
+    async def read(self, function: typing.Callable, *args: typing.Any) -> typing.Any:
+        """Run `function` on the reader thread, so queries don't block the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readers, function, *args)
+
+    async def write(self, function: typing.Callable, *args: typing.Any) -> typing.Any:
+        """Run `function` on the writer thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    @contextlib.contextmanager
+    def transaction(self) -> typing.Iterator[sqlite3.Connection]:
+        """Run the body as a single write transaction on the writer connection, rolling back if it raises (writer thread only)."""
+        self.writer.execute("BEGIN IMMEDIATE")
+
+        try:
+            yield self.writer
+        except BaseException:
+            self.writer.execute("ROLLBACK")
+            raise
+
+        self.writer.execute("COMMIT")
+
+    def version(self) -> int:
+        """Return the database's data version as seen by the writer (which isn't bumped by the writer's own commits)."""
+        return self.writer.execute("PRAGMA data_version").fetchone()[0]
+
+    async def prepare(self) -> None:
+        # Tables and indexes are created when the engine is constructed.
+        pass
+
+    async def backfill(self, collection: str, defaults: dict) -> None:
+        statement = f'UPDATE "{collection}" SET document = json_set(document, ?, json(?)) WHERE json_type(document, ?) IS NULL'
+        rows = [(f"$.{field}", json.dumps(value), f"$.{field}") for field, value in defaults.items()]
+
+        def backfill() -> None:
+            with self.transaction() as connection:
+                connection.executemany(statement, rows)
+
+        await self.write(backfill)
+
+    async def find(self, collection: str, key: str, value: typing.Any) -> dict | None:
+        expression = self.expression(collection, key)
+        statement = f'SELECT document FROM "{collection}" WHERE {expression} = ? LIMIT 1'
+        row = await self.read(lambda: self.reader.execute(statement, (value,)).fetchone())
+        return self.decode(row[0]) if row is not None else None
+
+    async def find_many(self, collection: str, key: str, values: list[typing.Any]) -> list[dict]:
+        expression = self.expression(collection, key)
+        statement = f'SELECT document FROM "{collection}" WHERE {expression} IN (SELECT value FROM json_each(?))'
+        rows = await self.read(lambda: self.reader.execute(statement, (json.dumps(values),)).fetchall())
+        return [self.decode(row[0]) for row in rows]
+
+    async def latest(self, collection: str, key: str, value: typing.Any) -> dict | None:
+        expression = self.expression(collection, key)
+        statement = f'SELECT document FROM "{collection}" WHERE {expression} = ? ORDER BY rowid DESC LIMIT 1'
+        row = await self.read(lambda: self.reader.execute(statement, (value,)).fetchone())
+        return self.decode(row[0]) if row is not None else None
+
+    def upsert(self, collection: str, rows: list[tuple[typing.Any, str]]) -> list[typing.Any]:
+        """Upsert `(key, document)` rows in a single transaction on the writer thread. Returns the keys that were inserted."""
+        exists = f'SELECT 1 FROM "{collection}" WHERE key = ?'
+        statement = f'INSERT INTO "{collection}" (key, document) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET document = excluded.document'
+        inserted = []
+
+        with self.transaction() as connection:
+            for row in rows:
+                if connection.execute(exists, (row[0],)).fetchone() is None:
+                    inserted.append(row[0])
+
+                # Upserting keeps the original rowid, which preserves insertion order like MongoDB's `_id`.
+                connection.execute(statement, row)
+
+        return inserted
+
+    async def scan(self, collection: str, key: str, value: typing.Any) -> typing.AsyncIterator[dict]:
+        expression = self.expression(collection, key)
+        statement = f'SELECT document FROM "{collection}" WHERE {expression} = ?'
+        cursor = await self.read(self.reader.execute, statement, (value,))
+
+        # Rows are fetched in batches on the reader thread, letting other tasks run in between.
+        while (rows := await self.read(cursor.fetchmany, 500)):
+            for row in rows:
+                yield self.decode(row[0])
+
+    async def all(self, collection: str) -> typing.AsyncIterator[dict]:
+        cursor = await self.read(self.reader.execute, f'SELECT document FROM "{collection}"')
+
+        while (rows := await self.read(cursor.fetchmany, 500)):
+            for row in rows:
+                yield self.decode(row[0])
+
+    async def replace(self, collection: str, key: str, document: dict) -> bool:
+        rows = [(document[key], self.encode(document))]
+        inserted = await self.write(self.upsert, collection, rows)
+        return len(inserted) > 0
+
+    async def replace_many(self, collection: str, key: str, documents: list[dict]) -> list[typing.Any]:
+        rows = [(document[key], self.encode(document)) for document in documents]
+        return await self.write(self.upsert, collection, rows)
+
+    async def update_many(self, collection: str, key: str, updates: dict[typing.Any, dict]) -> None:
+        expression = self.expression(collection, key)
+        select = f'SELECT rowid, document FROM "{collection}" WHERE {expression} = ?'
+        update = f'UPDATE "{collection}" SET document = ? WHERE rowid = ?'
+
+        def merge() -> None:
+            # Merge every update inside a single transaction so there's only one commit.
+            with self.transaction() as connection:
+                for value, fields in updates.items():
+                    if (row := connection.execute(select, (value,)).fetchone()) is not None:
+                        document = self.decode(row[1])
+                        document.update(fields)
+                        connection.execute(update, (self.encode(document), row[0]))
+
+        await self.write(merge)
+
+    async def delete(self, collection: str, key: str, value: typing.Any) -> bool:
+        expression = self.expression(collection, key)
+        statement = f'DELETE FROM "{collection}" WHERE {expression} = ?'
+
+        def remove() -> int:
+            with self.transaction() as connection:
+                return connection.execute(statement, (value,)).rowcount
+
+        return await self.write(remove) > 0
+
+    async def changes(self, collection: str) -> typing.AsyncIterator[dict | None]:
+        # SQLite can't say what changed, but `data_version` cheaply tells us that another connection committed something.
+        # It's read through the writer so that the engine's own commits (already in the cache) don't count.
+        version = await self.write(self.version)
+
+        while True:
+            await asyncio.sleep(self.interval)
+            current = await self.write(self.version)
+
+            if current != version:
+                version = current
+                yield None
+
+    async def close(self) -> None:
+        await self.write(self.writer.close)
+        await self.read(self.reader.close)
+        self.executor.shutdown(wait=False)
+        self.readers.shutdown(wait=False)
+
 class Backend:
+    engine_object: Engine | None = None
+    task: asyncio.Task | None = None
+    closing: asyncio.Task | None = None
+    schema_current = False
+    buffer = WriteBuffer("starboarded_messages", "message_id", after=StarboardRollup.flush)
+
     @classmethod
     def setup(cls, bot: model.Bakerbot) -> None:
-        cls.db_object = bot.db
         cls.db_address = bot.secrets.get("mongodb-address", None)
+        cls.sqlite_path = bot.secrets.get("sqlite-path", None)
+
+        if cls.sqlite_path is not None:
+            cls.engine_object = SQLiteEngine(cls.sqlite_path)
+        elif bot.db is not None:
+            cls.engine_object = MongoEngine(bot.db)
+
+        if cls.engine_object is not None:
+            cls.task = bot.loop.create_task(cls.start(bot), name="database-start")
+            cls.task.add_done_callback(cls.report)
+
+    @staticmethod
+    def report(task: asyncio.Task) -> None:
+        """Log the exception of a background task that failed (e.g. because the MongoDB address is wrong)."""
+        if not task.cancelled() and (error := task.exception()) is not None:
+            logger.error("Database background task %s failed.", task.get_name(), exc_info=error)
+
+    @classmethod
+    def teardown(cls, bot: model.Bakerbot) -> None:
+        for task in (cls.task, GuildCache.task, cls.buffer.task):
+            if task is not None:
+                task.cancel()
+
+        # This also runs when the module is reloaded (e.g. by `Bakerbot.reload()`),
+        # so pending writes must make it to the database before the engine goes away.
+        if cls.engine_object is not None:
+            cls.closing = bot.loop.create_task(cls.stop(), name="database-stop")
+            cls.closing.add_done_callback(cls.report)
+
+    @classmethod
+    async def start(cls, bot: model.Bakerbot) -> None:
+        """Prepare the storage engine, then start any background work that depends on it."""
+        try:
+            await cls.engine_object.prepare()
+            await cls.migrate()
+        finally:
+            # Buffered writes still have to be flushed (and the cache kept coherent) if preparation fails.
+            GuildCache.task = asyncio.create_task(GuildCache.run(bot), name="guild-cache")
+            cls.buffer.task = asyncio.create_task(cls.buffer.run(), name="write-buffer")
+
+            for task in (GuildCache.task, cls.buffer.task):
+                task.add_done_callback(cls.report)
+
+    @classmethod
+    async def migrate(cls) -> None:
+        """Bring every document up to the current schema version (only does work once per version)."""
+        metadata = await cls.engine_object.find("metadata", "name", "schema")
+        version = metadata["version"] if metadata is not None else 0
+
+        if version < Schema.version:
+            for collection, defaults in Schema.defaults().items():
+                await cls.engine_object.backfill(collection, defaults)
+
+            document = {"name": "schema", "version": Schema.version}
+            await cls.engine_object.replace("metadata", "name", document)
+
+        cls.schema_current = version <= Schema.version
+
+    @classmethod
+    async def stop(cls) -> None:
+        """Flush any buffered writes, then close the storage engine."""
+        try:
+            # Background flushes (e.g. the one started when the starboard is unloaded) have to finish first.
+            await asyncio.gather(*cls.buffer.flushes, return_exceptions=True)
+            await cls.buffer.flush()
+        finally:
+            await cls.engine_object.close()
 
     @classmethod
     @property
-    def db(cls) -> motor.AsyncIOMotorDatabase:
-        """Return the bot's database object, throws an exception if not available."""
-        if cls.db_object is None:
-            address = cls.db_address or "No address specified."
+    def engine(cls) -> Engine:
+        """Return the bot's storage engine, throws an exception if not available."""
+        if cls.engine_object is None:
+            address = cls.db_address or cls.sqlite_path or "No address specified."
             raise DatabaseNotConnected(address)
 
-        return cls.db_object
+        return cls.engine_object
 
 class DatabaseNotConnected(Exception):
-    """Raised when the database object is `None`."""
+    """Raised when no storage engine is available."""
+    pass
+
+class ChangesUnavailable(Exception):
+    """Raised when a storage engine can't notify us of changes made by other processes."""
     pass
 
 def setup(bot: model.Bakerbot) -> None:
     Backend.setup(bot)
+
+def teardown(bot: model.Bakerbot) -> None:
+    Backend.teardown(bot)
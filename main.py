@@ -20,7 +20,7 @@ if __name__ == "__main__":
 
     # Load extra extensions that reside in the root directory so that they can be
     # reloaded using bot.reload_extension(). They are still imported as modules.
-    for extension in ("database", "exceptions", "utilities"):
+    for extension in ("database", "exceptions", "network", "utilities"):
         bot.load_extension(extension)
 
     # Load extensions from command group/backend folders.
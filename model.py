@@ -1,16 +1,29 @@
 from discord.ext import commands
 import motor.motor_asyncio as motor
+import pymongo.monitoring
+import collections
+import threading
 import aiohttp
 import typing
 import ujson
+import time
 
 class Bakerbot(commands.Bot):
     def __init__(self, *args: typing.Any, **kwargs: typing.Any) -> None:
         super().__init__(*args, **kwargs)
-        self.session = aiohttp.ClientSession(json_serialize=ujson.dumps)
+        self.session = self.create_session()
         self.secrets = self.load_secrets()
+        self.monitor = DatabaseMonitor()
         self.db = self.connect_database()
 
+    def create_session(self) -> aiohttp.ClientSession:
+        """Return the HTTP session shared by every backend."""
+        # Connections are kept alive between requests and DNS lookups are cached,
+        # so only the first request to each host pays for the TCP/TLS handshake.
+        options = {"limit": 100, "limit_per_host": 16, "ttl_dns_cache": 600, "keepalive_timeout": 120}
+        connector = aiohttp.TCPConnector(**options)
+        return aiohttp.ClientSession(connector=connector, json_serialize=ujson.dumps)
+
     def load_secrets(self) -> dict:
         """Load the contents of `secrets.json` from disk."""
         with open("secrets.json", "r") as file:
@@ -22,12 +35,11 @@ class Bakerbot(commands.Bot):
             return None
 
         address = self.secrets["mongodb-address"]
-        options = {"serverSelectionTimeoutMS": 2000}
+        options = {"serverSelectionTimeoutMS": 2000, "event_listeners": [self.monitor]}
         client = motor.AsyncIOMotorClient(address, **options)
 
-        # Make sure that the address is valid. If the database
-        # `anthony_baker` doesn't exist, just let the exception propagate.
-        self.loop.run_until_complete(client.server_info())
+        # The client connects lazily, so startup isn't blocked on the server.
+        # The storage engine checks that the address is valid once the bot is running.
         return client["anthony_baker"]
 
     def reload(self) -> None:
@@ -44,6 +56,143 @@ class Bakerbot(commands.Bot):
         token = self.secrets["discord-token"]
         super().run(token)
 
+class Histogram:
+    """A latency histogram with power-of-two millisecond buckets."""
+    bounds = [2 ** n for n in range(14)]
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.failures = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, milliseconds: float) -> None:
+        """Record a single sample."""
+        index = next((i for i, bound in enumerate(self.bounds) if milliseconds <= bound), len(self.bounds))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.maximum = max(self.maximum, milliseconds)
+
+    def mean(self) -> float:
+        """Return the mean of every recorded sample."""
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        """Return an upper bound on the given percentile (between 0 and 1)."""
+        target = percentile * self.count
+        seen = 0
+
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count > 0:
+                return self.bounds[index] if index < len(self.bounds) else self.maximum
+
+        return 0.0
+
+class DatabaseMonitor(pymongo.monitoring.CommandListener, pymongo.monitoring.ConnectionPoolListener):
+    """Records MongoDB command latencies and connection pool wait times (registered on the bot's Motor client)."""
+    def __init__(self, slowest: int=256) -> None:
+        # Motor runs PyMongo on worker threads, so every callback needs to hold the lock.
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pending: dict[int, tuple[str, str, typing.Any]] = {}
+        self.commands: dict[tuple[str, str], Histogram] = collections.defaultdict(Histogram)
+        self.recent: collections.deque[tuple[float, str, str, typing.Any]] = collections.deque(maxlen=slowest)
+        self.pool = Histogram()
+
+    @staticmethod
+    def describe(event: pymongo.monitoring.CommandStartedEvent) -> tuple[str, str, typing.Any]:
+        """Return the collection, operation and filter of a command."""
+        command = event.command
+        target = command.get(event.command_name, None)
+        collection = target if isinstance(target, str) else command.get("collection", "-")
+
+        if "filter" in command:
+            query = command["filter"]
+        elif "query" in command:
+            query = command["query"]
+        elif command.get("updates", None) or command.get("deletes", None):
+            query = (command.get("updates", None) or command.get("deletes"))[0].get("q", None)
+        elif command.get("pipeline", None):
+            query = command["pipeline"][0]
+        else:
+            query = None
+
+        return collection, event.command_name, query
+
+    def slowest(self, count: int) -> list[tuple[float, str, str, typing.Any]]:
+        """Return the slowest recent operations as `(milliseconds, collection, operation, filter)` tuples."""
+        with self.lock:
+            return sorted(self.recent, key=lambda r: r[0], reverse=True)[:count]
+
+    def finish(self, event: pymongo.monitoring.CommandSucceededEvent | pymongo.monitoring.CommandFailedEvent, failed: bool) -> None:
+        """Record a command that has completed."""
+        milliseconds = event.duration_micros / 1000
+
+        with self.lock:
+            if (description := self.pending.pop(event.request_id, None)) is None:
+                return
+
+            collection, operation, query = description
+            histogram = self.commands[(collection, operation)]
+            histogram.record(milliseconds)
+            histogram.failures += failed
+            self.recent.append((milliseconds, collection, operation, query))
+
+    def started(self, event: pymongo.monitoring.CommandStartedEvent) -> None:
+        description = self.describe(event)
+        with self.lock:
+            self.pending[event.request_id] = description
+
+    def succeeded(self, event: pymongo.monitoring.CommandSucceededEvent) -> None:
+        self.finish(event, False)
+
+    def failed(self, event: pymongo.monitoring.CommandFailedEvent) -> None:
+        self.finish(event, True)
+
+    def connection_check_out_started(self, event: pymongo.monitoring.ConnectionCheckOutStartedEvent) -> None:
+        # Checkouts happen synchronously on one thread, so a thread-local can pair the events up.
+        self.local.start = time.perf_counter()
+
+    def connection_checked_out(self, event: pymongo.monitoring.ConnectionCheckedOutEvent) -> None:
+        if (start := getattr(self.local, "start", None)) is not None:
+            milliseconds = (time.perf_counter() - start) * 1000
+            self.local.start = None
+
+            with self.lock:
+                self.pool.record(milliseconds)
+
+    def connection_check_out_failed(self, event: pymongo.monitoring.ConnectionCheckOutFailedEvent) -> None:
+        self.local.start = None
+        with self.lock:
+            self.pool.failures += 1
+
+    def pool_created(self, event: pymongo.monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: pymongo.monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: pymongo.monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: pymongo.monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: pymongo.monitoring.ConnectionCreatedEvent) -> None:
+        pass
+
+    def connection_ready(self, event: pymongo.monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: pymongo.monitoring.ConnectionClosedEvent) -> None:
+        pass
+
+    def connection_checked_in(self, event: pymongo.monitoring.ConnectionCheckedInEvent) -> None:
+        pass
+
 class SecretNotFound(Exception):
     """Raised whenever a secret cannot be found."""
     pass
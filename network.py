@@ -0,0 +1,595 @@
+import exceptions
+import model
+
+import concurrent.futures
+import email.utils
+import collections
+import contextlib
+import multidict
+import datetime
+import hashlib
+import fnmatch
+import sqlite3
+import asyncio
+import aiohttp
+import random
+import typing
+import ujson
+import http
+import time
+import yarl
+
+class Response:
+    """A completed HTTP response whose body has been read into memory."""
+    def __init__(self, status: int, headers: typing.Mapping[str, str], data: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+    def json(self) -> typing.Any:
+        """Decode the response body as JSON (straight from the raw bytes)."""
+        return ujson.loads(self.data)
+
+class Bucket:
+    """A token bucket that requests to a single host queue on (in FIFO order) until they can be sent."""
+    def __init__(self, requests: int, period: float, burst: int) -> None:
+        self.rate = requests / period
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.waits = model.Histogram()
+        self.queued = 0
+        self.peak = 0
+
+    def refill(self) -> None:
+        """Add the tokens that have accumulated since the last refill."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        start = time.perf_counter()
+        self.queued += 1
+        self.peak = max(self.peak, self.queued)
+
+        try:
+            # asyncio.Lock wakes waiters in order, so whoever queued first gets the next token.
+            async with self.lock:
+                self.refill()
+                if self.tokens < 1:
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+                    self.refill()
+
+                self.tokens -= 1
+        finally:
+            self.queued -= 1
+
+        self.waits.record((time.perf_counter() - start) * 1000)
+
+class Entry:
+    """A cached response along with the information needed to revalidate it."""
+    def __init__(self, response: Response, ttl: float) -> None:
+        self.response = response
+        self.expires = time.time() + ttl
+        self.etag = response.headers.get("ETag", None)
+        self.modified = response.headers.get("Last-Modified", None)
+
+    def size(self) -> int:
+        """Return the approximate number of bytes this entry occupies."""
+        return len(self.response.data) + 512
+
+    def fresh(self) -> bool:
+        """Return whether this entry can be used without asking the server."""
+        return time.time() < self.expires
+
+    def validators(self) -> dict[str, str]:
+        """Return the headers for a conditional request that revalidates this entry."""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.modified is not None:
+            headers["If-Modified-Since"] = self.modified
+
+        return headers
+
+class Cache:
+    """An in-memory LRU cache of HTTP responses, bounded by the size of their bodies."""
+    def __init__(self, capacity: int) -> None:
+        self.entries: collections.OrderedDict[tuple, Entry] = collections.OrderedDict()
+        self.capacity = capacity
+        self.size = 0
+
+        # Outcomes of cacheable requests, whichever tier answered them (the disk tier also counts its own lookups).
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> Entry | None:
+        """Return the entry for `key` (fresh or not) and mark it as recently used."""
+        if (entry := self.entries.get(key, None)) is not None:
+            self.entries.move_to_end(key)
+
+        return entry
+
+    def put(self, key: tuple, entry: Entry) -> None:
+        """Insert or replace an entry, evicting the least recently used ones if necessary."""
+        if (previous := self.entries.pop(key, None)) is not None:
+            self.size -= previous.size()
+
+        if entry.size() > self.capacity:
+            return
+
+        self.entries[key] = entry
+        self.size += entry.size()
+
+        while self.size > self.capacity:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size()
+            self.evictions += 1
+
+class DiskCache:
+    """A persistent SQLite tier beneath the in-memory response cache, so restarts and reloads don't start cold."""
+    def __init__(self, path: str, capacity: int, grace: float=7 * 86400) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.grace = grace
+        self.hits = 0
+        self.misses = 0
+
+        # The file is opened lazily on its own thread, so startup never waits for it.
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.connection: sqlite3.Connection | None = None
+
+    @staticmethod
+    def digest(key: tuple) -> str:
+        """Return the digest that identifies a request on disk."""
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def open(self) -> sqlite3.Connection:
+        """Return the connection to the cache file, opening it if necessary."""
+        if self.connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS responses (digest TEXT PRIMARY KEY, status INTEGER NOT NULL, "
+                               "headers TEXT NOT NULL, data BLOB NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)")
+
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+            self.connection = connection
+
+        return self.connection
+
+    def read(self, digest: str) -> tuple | None:
+        """Return the row for `digest` and mark it as recently used."""
+        connection = self.open()
+        row = connection.execute("SELECT status, headers, data, expires FROM responses WHERE digest = ?", (digest,)).fetchone()
+
+        if row is not None:
+            connection.execute("UPDATE responses SET used = ? WHERE digest = ?", (time.time(), digest))
+
+        return row
+
+    def write(self, digest: str, entry: Entry) -> None:
+        """Insert or replace the row for `digest`."""
+        response = entry.response
+        headers = ujson.dumps(dict(response.headers))
+        row = (digest, response.status, headers, response.data, entry.expires, time.time())
+
+        try:
+            self.open().execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", row)
+        except sqlite3.Error:
+            # Losing a write only means a colder cache next time.
+            pass
+
+    def compact(self) -> int:
+        """Delete entries that expired long ago, then the least recently used ones until the file fits within its capacity."""
+        connection = self.open()
+        removed = connection.execute("DELETE FROM responses WHERE expires < ?", (time.time() - self.grace,)).rowcount
+        excess = connection.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM responses").fetchone()[0] - self.capacity
+        victims = []
+
+        if excess > 0:
+            for digest, size in connection.execute("SELECT digest, LENGTH(data) FROM responses ORDER BY used"):
+                victims.append((digest,))
+                if (excess := excess - size) <= 0:
+                    break
+
+            connection.executemany("DELETE FROM responses WHERE digest = ?", victims)
+
+        return removed + len(victims)
+
+    def close(self) -> None:
+        """Close the connection to the cache file."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    async def run(self, function: typing.Callable, *args: typing.Any) -> typing.Any:
+        """Run `function` on the cache's thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def get(self, key: tuple) -> Entry | None:
+        """Return the entry for `key`, if one exists on disk."""
+        try:
+            row = await self.run(self.read, self.digest(key))
+        except sqlite3.Error:
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        status, headers, data, expires = row
+        response = Response(status, multidict.CIMultiDict(ujson.loads(headers)), data)
+        return Entry(response, expires - time.time())
+
+    def put(self, key: tuple, entry: Entry) -> None:
+        """Write an entry to disk in the background."""
+        self.executor.submit(self.write, self.digest(key), entry)
+
+class Breaker:
+    """A circuit breaker that fails requests fast while an endpoint keeps failing."""
+    def __init__(self, threshold: int=5, cooldown: float=30) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.opened: float | None = None
+        self.failures = 0
+        self.trips = 0
+
+    def remaining(self) -> float:
+        """Return the number of seconds until the breaker lets a trial request through."""
+        return max(0, self.opened + self.cooldown - time.monotonic()) if self.opened is not None else 0
+
+    def state(self) -> str:
+        """Return the state of the breaker as a string."""
+        if self.opened is None:
+            return "closed"
+
+        return "open" if self.remaining() > 0 else "half-open"
+
+    def check(self, name: str) -> None:
+        """Raise `CircuitOpen` if requests to the endpoint shouldn't be sent right now."""
+        if self.opened is None:
+            return
+
+        if (remaining := self.remaining()) > 0:
+            raise CircuitOpen(name, remaining)
+
+        # Let this request through as a trial, but keep everyone else out until it finishes (or for another cooldown).
+        self.opened = time.monotonic()
+
+    def record(self, success: bool) -> None:
+        """Record the outcome of a request."""
+        if success:
+            self.failures = 0
+            self.opened = None
+            return
+
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.trips += self.opened is None
+            self.opened = time.monotonic()
+
+class Endpoint:
+    """A base URL that a backend sends HTTP requests to, along with its transport settings."""
+    statuses = {http.HTTPStatus.TOO_MANY_REQUESTS, http.HTTPStatus.BAD_GATEWAY, http.HTTPStatus.SERVICE_UNAVAILABLE, http.HTTPStatus.GATEWAY_TIMEOUT}
+
+    def __init__(self, name: str, base: str, *, timeout: float=30, error: str | None=None, warm: bool=True, rate: tuple[int, float] | None=None,
+                 burst: int | None=None, retries: int=2, retryable: typing.Callable[[Response], bool] | None=None, ttls: dict[str, float] | None=None,
+                 idempotent: typing.Iterable[str]=("GET", "HEAD")) -> None:
+        self.name = name
+        self.base = base
+        self.error = error
+        self.warm = warm
+        self.timeout = aiohttp.ClientTimeout(total=Transport.timeouts.get(name, timeout))
+        self.retries = retries
+        self.retryable = retryable
+        self.idempotent = frozenset(idempotent)
+        self.ttls = ttls or {}
+        self.breaker = Breaker()
+        self.inflight: dict[tuple, asyncio.Task] = {}
+        self.coalesced = 0
+        self.retried = 0
+        Transport.register(self)
+
+        if rate is not None:
+            requests, period = rate
+            Transport.limit(yarl.URL(base).host, requests, period, burst or requests)
+
+    def url(self, path: str | yarl.URL) -> str | yarl.URL:
+        """Return the absolute URL for `path` (already absolute `yarl.URL` objects are passed through)."""
+        return path if isinstance(path, yarl.URL) else f"{self.base}/{path}"
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """Return how long to wait before retrying (exponential backoff with full jitter)."""
+        return random.uniform(0, min(8, 0.5 * 2 ** attempt))
+
+    @staticmethod
+    def retry_after(response: Response) -> float | None:
+        """Return the number of seconds that a response's `Retry-After` header asks for, if present."""
+        if (header := response.headers.get("Retry-After", None)) is None:
+            return None
+
+        try:
+            return max(0, float(header))
+        except ValueError:
+            pass
+
+        try:
+            when = email.utils.parsedate_to_datetime(header)
+        except (TypeError, ValueError):
+            return None
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return max(0, (when - now).total_seconds())
+
+    def failed(self, response: Response) -> bool:
+        """Return whether a response means the API is failing (rather than the request being bad)."""
+        return response.status >= http.HTTPStatus.INTERNAL_SERVER_ERROR or (self.retryable is not None and self.retryable(response))
+
+    async def send(self, method: str, url: str | yarl.URL, **kwargs: typing.Any) -> Response:
+        """Send a single HTTP request and return the response."""
+        await Transport.acquire(url)
+        async with Transport.session.request(method, url, timeout=self.timeout, **kwargs) as response:
+            data = await response.read()
+            return Response(response.status, response.headers, data)
+
+    async def request(self, method: str, path: str | yarl.URL, **kwargs: typing.Any) -> Response:
+        """Send a HTTP request (retrying transient failures) and return the response, regardless of its status."""
+        url = self.url(path)
+
+        # Only idempotent methods are retried, repeating anything else could create duplicates (or cost twice).
+        retries = self.retries if method in self.idempotent else 0
+
+        # The breaker sees one check and one outcome per request rather than per attempt, so retries can't trip it
+        # by themselves (or be turned away by the half-open breaker that let their own trial request through).
+        self.breaker.check(self.name)
+
+        try:
+            response = await self.attempts(method, url, retries, **kwargs)
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+            self.breaker.record(False)
+            raise
+
+        self.breaker.record(not self.failed(response))
+        return response
+
+    async def attempts(self, method: str, url: str | yarl.URL, retries: int, **kwargs: typing.Any) -> Response:
+        """Send a HTTP request up to `retries` more times while it fails transiently, returning the last response."""
+        for attempt in range(retries + 1):
+            final = attempt == retries
+
+            try:
+                response = await self.send(method, url, **kwargs)
+            except asyncio.TimeoutError:
+                # Timeouts aren't retried, otherwise a dead API would hang commands for several timeouts.
+                raise
+            except aiohttp.ClientConnectionError:
+                if final:
+                    raise
+
+                delay = self.backoff(attempt)
+            else:
+                if final or not (self.failed(response) or response.status in self.statuses):
+                    return response
+
+                # Honour the server's Retry-After, unless it wants us to wait for longer than a user would.
+                if (delay := self.retry_after(response)) is None:
+                    delay = self.backoff(attempt)
+                elif delay > Transport.patience:
+                    return response
+
+            self.retried += 1
+            await asyncio.sleep(delay)
+
+    def check(self, response: Response) -> typing.Any:
+        """Return the decoded body of a successful response, otherwise raise `exceptions.HTTPUnexpected`."""
+        if response.status != http.HTTPStatus.OK:
+            try: formatted = response.json()
+            except ValueError: formatted = {}
+
+            error = formatted.get(self.error, None) if self.error is not None and isinstance(formatted, dict) else None
+            raise exceptions.HTTPUnexpected(response.status, str(error) if error is not None else None)
+
+        return response.json()
+
+    @staticmethod
+    def normalise(values: typing.Any) -> tuple:
+        """Return a hashable, order-independent form of a request's parameters or headers."""
+        if values is None:
+            return ()
+
+        items = values.items() if isinstance(values, typing.Mapping) else values
+        return tuple(sorted((str(k), repr(v)) for k, v in items))
+
+    def key(self, method: str, path: str | yarl.URL, kwargs: dict[str, typing.Any]) -> tuple | None:
+        """Return the key that identical requests share, or `None` if the request shouldn't be coalesced."""
+        if kwargs.keys() - {"params", "headers"}:
+            return None
+
+        params = self.normalise(kwargs.get("params", None))
+        headers = self.normalise(kwargs.get("headers", None))
+        return method, str(self.url(path)), params, headers
+
+    def ttl(self, method: str, path: str | yarl.URL) -> float | None:
+        """Return how long a response may be cached for (the first pattern in `self.ttls` that matches the path wins)."""
+        if method != "GET":
+            return None
+
+        route = path.path.lstrip("/") if isinstance(path, yarl.URL) else path
+        return next((ttl for pattern, ttl in self.ttls.items() if fnmatch.fnmatchcase(route, pattern)), None)
+
+    async def cached(self, method: str, path: str | yarl.URL, **kwargs: typing.Any) -> Response:
+        """Send a HTTP request, answering it from (or revalidating it against) the response cache where possible."""
+        if (ttl := self.ttl(method, path)) is None or (key := self.key(method, path, kwargs)) is None:
+            return await self.request(method, path, **kwargs)
+
+        cache = Transport.cache
+        if (entry := cache.get(key)) is not None and entry.fresh():
+            cache.hits += 1
+            return entry.response
+
+        # Fall back to the disk tier, promoting whatever it has into memory.
+        if entry is None and (entry := await Transport.disk.get(key)) is not None:
+            cache.put(key, entry)
+            if entry.fresh():
+                cache.hits += 1
+                return entry.response
+
+        if entry is not None and (validators := entry.validators()):
+            kwargs["headers"] = {**(kwargs.get("headers", None) or {}), **validators}
+
+        response = await self.request(method, path, **kwargs)
+
+        if entry is not None and response.status == http.HTTPStatus.NOT_MODIFIED:
+            cache.revalidations += 1
+            entry.expires = time.time() + ttl
+            Transport.disk.put(key, entry)
+            return entry.response
+
+        cache.misses += 1
+        if response.status == http.HTTPStatus.OK and "no-store" not in response.headers.get("Cache-Control", ""):
+            entry = Entry(response, ttl)
+            cache.put(key, entry)
+            Transport.disk.put(key, entry)
+
+        return response
+
+    async def fetch(self, method: str, path: str | yarl.URL, **kwargs: typing.Any) -> typing.Any:
+        """Send a HTTP request and return the decoded JSON response."""
+        response = await self.cached(method, path, **kwargs)
+        return self.check(response)
+
+    async def get(self, path: str | yarl.URL, **kwargs: typing.Any) -> typing.Any:
+        """Send a HTTP GET request and return the decoded JSON response (shared with identical in-flight requests, so don't mutate it)."""
+        if (key := self.key("GET", path, kwargs)) is None:
+            return await self.fetch("GET", path, **kwargs)
+
+        if (task := self.inflight.get(key, None)) is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(self.fetch("GET", path, **kwargs))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self.settle(key, t))
+
+        # Shielded so that one caller giving up doesn't cancel the request for everyone else.
+        return await asyncio.shield(task)
+
+    def settle(self, key: tuple, task: asyncio.Task) -> None:
+        """Forget about a finished in-flight request."""
+        self.inflight.pop(key, None)
+
+        # Mark the exception as retrieved in case every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    async def post(self, path: str | yarl.URL, **kwargs: typing.Any) -> typing.Any:
+        """Send a HTTP POST request and return the decoded JSON response."""
+        return await self.fetch("POST", path, **kwargs)
+
+class Transport:
+    """The HTTP transport shared by every backend (connection limits, keep-alive and DNS caching live on the bot's session)."""
+    endpoints: dict[str, Endpoint] = {}
+    timeouts: dict[str, float] = {}
+    buckets: dict[str, Bucket] = {}
+    cache = Cache(32 * 1024 * 1024)
+    patience = 10
+
+    @classmethod
+    def setup(cls, bot: model.Bakerbot) -> None:
+        cls.session = bot.session
+        cls.timeouts = bot.secrets.get("http-timeouts", {})
+        cls.disk = DiskCache(bot.secrets.get("http-cache-path", "http-cache.sqlite3"), 256 * 1024 * 1024)
+        cls.tasks = [bot.loop.create_task(cls.prewarm()), bot.loop.create_task(cls.compact())]
+
+    @classmethod
+    def teardown(cls, bot: model.Bakerbot) -> None:
+        for task in cls.tasks:
+            task.cancel()
+
+        cls.disk.executor.submit(cls.disk.close)
+        cls.disk.executor.shutdown(wait=False)
+
+    @classmethod
+    async def compact(cls, interval: float=3600) -> None:
+        """Periodically compact the disk cache."""
+        while True:
+            try:
+                await cls.disk.run(cls.disk.compact)
+            except sqlite3.Error:
+                pass
+
+            await asyncio.sleep(interval)
+
+    @classmethod
+    def register(cls, endpoint: Endpoint) -> None:
+        """Register an endpoint with the transport."""
+        cls.endpoints[endpoint.name] = endpoint
+
+    @classmethod
+    def limit(cls, host: str, requests: int, period: float, burst: int) -> None:
+        """Allow at most `requests` per `period` seconds (after an initial `burst`) to be sent to `host`."""
+        bucket = cls.buckets.get(host, None)
+
+        # Keep the existing bucket (and its metrics) when a backend is reloaded with the same budget.
+        if bucket is None or bucket.rate != requests / period or bucket.capacity != burst:
+            cls.buckets[host] = Bucket(requests, period, burst)
+
+    @classmethod
+    async def acquire(cls, url: str | yarl.URL) -> None:
+        """Wait for the rate limiter of `url`'s host, if it has one."""
+        host = url.host if isinstance(url, yarl.URL) else yarl.URL(url).host
+        if (bucket := cls.buckets.get(host, None)) is not None:
+            await bucket.acquire()
+
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def stream(cls, url: str, timeout: float=60) -> typing.AsyncIterator[aiohttp.ClientResponse]:
+        """Open `url` so its body can be read as it arrives (for hosts that aren't registered as an endpoint, like CDNs)."""
+        async with cls.session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != http.HTTPStatus.OK:
+                raise exceptions.HTTPUnexpected(response.status)
+
+            yield response
+
+    @classmethod
+    async def touch(cls, url: str) -> None:
+        """Download `url` and throw the body away (to get it into a CDN's cache), ignoring any errors."""
+        try:
+            async with cls.session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                async for _ in response.content.iter_chunked(65536):
+                    pass
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+
+    @classmethod
+    async def prewarm(cls) -> None:
+        """Open (and keep alive) a TLS connection to every registered endpoint so first requests skip the handshake."""
+        async def connect(endpoint: Endpoint) -> None:
+            try:
+                async with cls.session.head(endpoint.base, timeout=endpoint.timeout):
+                    pass
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # This is only an optimisation, the real request will report any errors.
+                pass
+
+        await asyncio.gather(*(connect(e) for e in cls.endpoints.values() if e.warm))
+
+class CircuitOpen(Exception):
+    """Raised when an endpoint has been failing and requests to it are being refused."""
+    def __init__(self, name: str, remaining: float) -> None:
+        self.name = name
+        self.remaining = remaining
+        super().__init__(f"The {name} API is unavailable, requests will be retried in {remaining:.0f} seconds.")
+
+def setup(bot: model.Bakerbot) -> None:
+    Transport.setup(bot)
+
+def teardown(bot: model.Bakerbot) -> None:
+    Transport.teardown(bot)
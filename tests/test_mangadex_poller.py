@@ -0,0 +1,104 @@
+from backends import mangadex as backend
+from cogs import mangadex
+import database
+
+import unittest.mock
+import unittest
+import discord
+import asyncio
+import typing
+import time
+
+def chapter(manga: str, created: str) -> backend.Chapter:
+    """Return a chapter of `manga` that was created (and last updated) at `created`."""
+    return backend.Chapter({
+        "id": f"{manga}-{created}",
+        "attributes": {
+            "title": None, "volume": None, "chapter": "1", "translatedLanguage": "en", "externalUrl": None,
+            "version": 1, "createdAt": created, "updatedAt": created, "publishAt": created
+        },
+        "relationships": [{"id": manga, "type": "manga"}]
+    })
+
+class PollerTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for the Mangadex cog's new chapter poller."""
+    def setUp(self) -> None:
+        # The first batch of 100 series is `manga-0` to `manga-99`, `manga-100` is the only one in the second batch.
+        now = time.time()
+        series = [database.MangaSeries.new(f"manga-{n}", f"Manga {n}", now - 3600) for n in range(101)]
+        for s in series:
+            s.watermark = "2024-01-01T00:00:00"
+            s.due = now - 1
+
+        self.channel = unittest.mock.AsyncMock()
+        self.bot = unittest.mock.Mock()
+        self.bot.get_channel.return_value = self.channel
+
+        self.cog = mangadex.Mangadex.__new__(mangadex.Mangadex)
+        self.cog.bot = self.bot
+        self.cog.following = asyncio.Lock()
+        self.cog.series = {s.manga_id: s for s in series}
+
+        self.follows = [database.MangaFollow(f"1:manga-{n}", 1, None, f"manga-{n}", f"Manga {n}") for n in range(101)]
+        self.written: list[database.MangaSeries] = []
+
+    def updates(self, failing: bool) -> typing.Callable:
+        """Return a replacement for `Backend.updates()` that releases a chapter in each batch (the second can fail)."""
+        async def updates(identifiers: list[str], since: str) -> typing.AsyncIterator[list[backend.Chapter]]:
+            if "manga-100" in identifiers and failing:
+                raise asyncio.TimeoutError()
+
+            yield [chapter(identifiers[0], "2024-02-01T00:00:00")]
+
+        return updates
+
+    async def following(self, identifiers: list[str]) -> list[database.MangaFollow]:
+        return [follow for follow in self.follows if follow.manga_id in identifiers]
+
+    async def write_many(self, series: list[database.MangaSeries]) -> None:
+        # Nothing should be committed before every announcement has been sent.
+        self.assertEqual(self.channel.send.await_count, 2)
+        self.written.extend(series)
+
+    def patch(self, failing: bool) -> None:
+        patches = [
+            unittest.mock.patch.object(backend.Backend, "client", "https://mangadex.org", create=True),
+            unittest.mock.patch.object(backend.Backend, "updates", self.updates(failing)),
+            unittest.mock.patch.object(database.MangaFollow, "following", self.following),
+            unittest.mock.patch.object(database.MangaSeries, "write_many", self.write_many)
+        ]
+
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_failing_batch_commits_nothing(self) -> None:
+        self.patch(failing=True)
+        watermarks = {identifier: s.watermark for identifier, s in self.cog.series.items()}
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.cog.poll()
+
+        # The first batch's chapter must not be announced or skipped, the next cycle picks it up again.
+        self.channel.send.assert_not_awaited()
+        self.assertEqual(self.written, [])
+        self.assertEqual({identifier: s.watermark for identifier, s in self.cog.series.items()}, watermarks)
+
+    async def test_watermarks_advance_after_announcing(self) -> None:
+        self.patch(failing=False)
+        await self.cog.poll()
+
+        self.assertEqual(self.channel.send.await_count, 2)
+        self.assertEqual(len(self.written), 101)
+        self.assertTrue(all(s.watermark == "2024-02-01T00:00:00" for s in self.cog.series.values()))
+
+    async def test_failed_send_still_commits(self) -> None:
+        self.patch(failing=False)
+        self.channel.send.side_effect = [discord.HTTPException(unittest.mock.Mock(status=403), "Missing Access"), None]
+        await self.cog.poll()
+
+        # A channel that can't be posted in shouldn't hold back every other series.
+        self.assertEqual(len(self.written), 101)
+
+if __name__ == "__main__":
+    unittest.main()